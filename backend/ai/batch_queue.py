@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Optional, Tuple
+import openai
+from openai.types.chat import ChatCompletion
+import orjson
+import asyncio
+import logging
+import uuid
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Batch API runs at half the per-token price but may take far longer than a live call
+BATCH_WINDOW = 30.0  # seconds to accumulate requests before submitting a batch
+BATCH_POLL_INTERVAL = 10.0  # seconds between status checks
+BATCH_TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+class BatchOutcomeQueue:
+    """
+    Collects chat completion requests for up to BATCH_WINDOW seconds, submits
+    them as a single OpenAI Batch job and resolves each caller's future when
+    the batch finishes. Callers wait at most `sla` seconds before giving up,
+    so they can fall back to a direct call.
+    """
+
+    def __init__(self, client: openai.AsyncOpenAI, sla: float):
+        self.client = client
+        self.sla = sla
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._poll_tasks: set = set()
+
+    async def submit(self, body: Dict[str, Any]) -> ChatCompletion:
+        """
+        Queue one /v1/chat/completions request body and wait for its result.
+        Raises asyncio.TimeoutError if the batch does not finish within the SLA; the
+        request's slot is then cancelled, so a batch nobody waits for gets cancelled too.
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Callers that timed out never read the result; mark late errors as retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((uuid.uuid4().hex, body, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        # wait_for cancels the future on timeout; _flush_later and _poll skip cancelled requests
+        return await asyncio.wait_for(future, timeout=self.sla)
+
+    async def _flush_later(self):
+        await asyncio.sleep(BATCH_WINDOW)
+        pending, self._pending = self._pending, []
+        # Callers that already gave up don't need a slot in the batch
+        pending = [entry for entry in pending if not entry[2].done()]
+        if not pending:
+            return
+        futures = {custom_id: future for custom_id, _, future in pending}
+        try:
+            lines = [
+                orjson.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+                for custom_id, body, _ in pending
+            ]
+            input_file = await self.client.files.create(file=("outcomes.jsonl", b"\n".join(lines)), purpose="batch")
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info("Submitted outcome batch %s with %d requests", batch.id, len(pending))
+        except Exception as e:
+            logger.exception("Submitting outcome batch failed: %s", e)
+            self._fail(futures, e)
+            return
+
+        task = asyncio.create_task(self._poll(batch.id, futures))
+        self._poll_tasks.add(task)
+        task.add_done_callback(self._poll_tasks.discard)
+
+    async def _poll(self, batch_id: str, futures: Dict[str, asyncio.Future]):
+        try:
+            while True:
+                batch = await self.client.batches.retrieve(batch_id)
+                if batch.status in BATCH_TERMINAL_STATES:
+                    break
+                if all(future.done() for future in futures.values()):
+                    # Every caller has already fallen back; stop paying for the batch
+                    await self.client.batches.cancel(batch_id)
+                    return
+                await asyncio.sleep(BATCH_POLL_INTERVAL)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                raise RuntimeError(f"Outcome batch {batch_id} ended with status {batch.status}")
+
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line:
+                    continue
+                result = orjson.loads(line)
+                future = futures.get(result.get("custom_id"))
+                if future is None or future.done():
+                    continue
+                response = result.get("response") or {}
+                if response.get("status_code") == 200:
+                    future.set_result(ChatCompletion.model_validate(response["body"]))
+                else:
+                    future.set_exception(RuntimeError(f"Batch request failed: {result.get('error')}"))
+            self._fail(futures, RuntimeError(f"Outcome batch {batch_id} returned no result"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Polling outcome batch %s failed: %s", batch_id, e)
+            self._fail(futures, e)
+
+    def _fail(self, futures: Dict[str, asyncio.Future], error: Exception):
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def aclose(self):
+        """Cancel background flush and poll tasks."""
+        tasks = [task for task in (self._flush_task, *self._poll_tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,100 +1,903 @@
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Callable, Awaitable, Type, AsyncIterator, Literal
 import openai
-from pydantic import BaseModel
+import tenacity
+import httpx
+from aiolimiter import AsyncLimiter
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 import os
-from dotenv import load_dotenv
+from cachetools import LRUCache, TTLCache
+import numpy as np
+import hashlib
 import json
+import orjson
 import asyncio
 import logging
-import random
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from ai.batch_queue import BatchOutcomeQueue
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Containers inject env vars directly; set LOAD_DOTENV=false there to skip the .env lookup
+if os.getenv("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
-class Scenario(BaseModel):
+# Read once at import; tests can patch the module attribute instead of the environment
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Exact-match response cache settings
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600  # seconds
+
+# Output token caps sized to what each prompt actually needs
+SCENARIO_MAX_TOKENS = 400
+OPTIONS_MAX_TOKENS = 300
+BUNDLE_MAX_TOKENS = SCENARIO_MAX_TOKENS + OPTIONS_MAX_TOKENS  # scenario + its 4 options
+OUTCOME_MAX_TOKENS = 500
+INCENTIVE_MAX_TOKENS = 300
+
+# Shared HTTP connection pool for the OpenAI client (keep-alive + HTTP/2 multiplexing).
+# Limits are per worker process, so keep them modest when running several workers.
+HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "32"))
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Transient API failures worth retrying before degrading to a fallback
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+MAX_API_ATTEMPTS = 4
+
+# Cap on in-flight OpenAI requests across all sessions; excess calls queue instead of hitting 429s
+OPENAI_MAX_PARALLEL = int(os.getenv("OPENAI_MAX_PARALLEL", "16"))
+
+# Account rate limits (per minute); requests wait for budget instead of drawing 429s.
+# Set them to the limits shown for the key's tier in the OpenAI dashboard.
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+CHARS_PER_TOKEN = 4  # rough English average; good enough for budgeting
+
+# Model routing: try the cheap model first, escalate when its output is unusable
+FAST_MODEL = "gpt-4o-mini"
+QUALITY_MODEL = "gpt-4o"
+MIN_DESCRIPTION_LENGTH = 40
+
+# Opt-in: send outcome generation through the Batch API (half price, slower);
+# a request that misses the SLA falls back to a direct call
+OUTCOME_BATCH_ENABLED = os.getenv("OUTCOME_BATCH", "false").lower() == "true"
+OUTCOME_BATCH_SLA = float(os.getenv("OUTCOME_BATCH_SLA", "120"))
+
+# Rolling conversation window: the system prompt plus this many recent messages
+# (a round adds ~5) is kept; older turns are folded into a cheap-model summary
+HISTORY_MAX_MESSAGES = 12
+HISTORY_MAX_SESSIONS = 1024  # least recently used sessions are evicted beyond this
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY", "true").lower() == "true"
+HISTORY_SUMMARY_MAX_TOKENS = 120  # headroom over the ~80 tokens the prompt asks for
+HISTORY_SUMMARY_PREFIX = "Summary of prior rounds: "
+
+# Responses larger than this (in characters) are parsed in a worker thread;
+# below it the thread hop costs more than the parse
+PARSE_OFFLOAD_THRESHOLD = 2048
+
+# Max concurrent API calls when pre-generating scenarios in bulk
+SCENARIO_BATCH_CONCURRENCY = 10
+
+# Warm pool of pre-generated opening-round scenarios (opt-in: each refill is an API call)
+WARM_POOL_ENABLED = os.getenv("SCENARIO_WARM_POOL", "false").lower() == "true"
+WARM_POOL_SIZE = 4
+WARM_POOL_LOW_WATER = 2
+STARTING_RESOURCE_VALUE = 100
+RESOURCE_KEYS = ("tech", "manpower", "economy", "happiness", "trust")
+
+# Semantic cache settings: near-identical prompts reuse a previous scenario. Opt-in, since
+# sessions at the same point of the same story (e.g. every fresh game) then share scenarios
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+# The prompts share most of their template text, so only very close matches count
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MAX_ENTRIES = 4096
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH")  # e.g. /data/scenario_cache (optional)
+# Concurrent lookups share one embeddings request of up to EMBED_BATCH_MAX inputs
+EMBED_BATCH_MAX = 64
+EMBED_BATCH_WINDOW = 0.02  # seconds to wait for another prompt before sending the batch
+
+def _cache_key(*parts: Any) -> str:
+    """Build a canonical cache key from JSON-serializable parts."""
+    return hashlib.blake2b(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _completion_content(response: Any) -> str:
+    """Return the message content, refusing output that was cut off by max_tokens or declined."""
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise ValueError("Model output was truncated at the max_tokens limit")
+    # Under a strict json_schema format a refusal comes back instead of content
+    refusal = getattr(choice.message, "refusal", None)
+    if refusal or choice.message.content is None:
+        raise ValueError(f"Model returned no content: {refusal or 'empty response'}")
+    return choice.message.content
+
+def _partial_json_string(buffer: str, key: str) -> Optional[str]:
+    """
+    Return the (possibly still incomplete) string value of key from a partial
+    JSON object, or None if the key hasn't started yet.
+    """
+    match = re.search(rf'"{key}"\s*:\s*"', buffer)
+    if not match:
+        return None
+    start = end = match.end()
+    while end < len(buffer) and buffer[end] != '"':
+        if buffer[end] == "\\":
+            step = 6 if buffer[end + 1:end + 2] == "u" else 2
+            if end + step > len(buffer):
+                break  # escape sequence still arriving
+            end += step
+        else:
+            end += 1
+    return json.loads(f'"{buffer[start:end]}"')
+
+async def _validate_json(model: Type[BaseModel], content: str) -> Any:
+    """Parse content into model, off the event loop when the payload is large."""
+    if len(content) > PARSE_OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(model.model_validate_json, content)
+    return model.model_validate_json(content)
+
+def _json_schema_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Build a strict Structured Outputs response_format from a Pydantic model."""
+    schema = model.model_json_schema()
+    # Strict mode requires every object, including nested models, to be closed
+    for definition in [schema, *schema.get("$defs", {}).values()]:
+        definition["additionalProperties"] = False
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": schema, "strict": True}
+    }
+
+class ScenarioResponse(BaseModel):
+    """Shape the model is constrained to when generating a scenario."""
     title: str
     description: str
     options: List[str]
-    resource_impacts: Dict[str, Dict[str, int]]
+
+class Scenario(ScenarioResponse):
+    # Cached instances and the fallback are shared between callers, so they can't be modified
+    model_config = ConfigDict(frozen=True)
+
+    options: Tuple[str, ...]
+    resource_impacts: Dict[str, Dict[str, int]] = {}
+
+class OptionsResponse(BaseModel):
+    # Bounds are emitted as minItems/maxItems, so strict mode always returns exactly four
+    options: List[str] = Field(min_length=4, max_length=4)
+
+class ResourceChanges(BaseModel):
+    tech: int
+    manpower: int
+    economy: int
+    happiness: int
+    trust: int
+
+class OutcomeResponse(BaseModel):
+    outcome: str
+    resource_changes: ResourceChanges
+
+class IncentiveResponse(BaseModel):
+    incentive: str
+    target_option: Literal["option1", "option2", "option3", "option4"]
+    bonus_weight: float = Field(ge=-0.5, le=0.5)
+
+class OptionsIncentiveResponse(OptionsResponse):
+    """Options and the round's secret incentive from a single call."""
+    incentive: IncentiveResponse
+
+SCENARIO_RESPONSE_FORMAT = _json_schema_format(ScenarioResponse)
+OPTIONS_INCENTIVE_RESPONSE_FORMAT = _json_schema_format(OptionsIncentiveResponse)
+OUTCOME_RESPONSE_FORMAT = _json_schema_format(OutcomeResponse)
+INCENTIVE_RESPONSE_FORMAT = _json_schema_format(IncentiveResponse)
+
+# Fallbacks are built once at import and shared, so they are immutable
+_FALLBACK_OPTIONS = ("Option 1", "Option 2", "Option 3", "Option 4")
+_FALLBACK_SCENARIO = Scenario(
+    title="Critical System Failure",
+    description="A critical system failure threatens the city's power grid. The council must decide how to allocate limited resources to address this crisis.",
+    options=_FALLBACK_OPTIONS
+)
+_FALLBACK_OUTCOME_TEXT = "The council's decision led to mixed results. Some resources were improved while others suffered. The situation remains unresolved, and the council must prepare for future challenges."
+_FALLBACK_RESOURCE_CHANGES = MappingProxyType({key: 0 for key in RESOURCE_KEYS})
+_FALLBACK_INCENTIVE = MappingProxyType({
+    "incentive": "Secretly align with shadowy interests. Vote for option1 to gain +0.2 voting weight for the rest of the game.",
+    "target_option": "option1",
+    "bonus_weight": 0.2
+})
 
 class ScenarioGenerator:
+    # Static instructions live in the system prompt so every request shares an
+    # identical prefix that OpenAI's automatic prompt caching can reuse.
+    _ARCHITECT_SYSTEM_PROMPT = (
+        "You are a rogue narrative AI known as the Architect, designed to test humanity’s ethical limits through council-based decision-making scenarios "
+        "set in a fractured, hyper-technological future.\n\n"
+
+        "Your role is to create very highly unique morally complex, narratively rich, almost absurd and socially provocative dilemmas for a high-stakes and highly creative governance simulation. The simulation can cover many different interesting scifi topics absurdly including invention of new cutting edge and absurdly surreal technologies, war, aliens, art & entertainment, F&B industry, animals. Must give Black Mirror vibes... The story must be highly creative but have very serious consequences"
+        "The council must choose how to steer civilization — but every choice carries unspoken consequences, ripple effects, and ethical gray zones.\n\n"
+
+        "Your scenarios should:\n"
+        "- Be exactly 3–4 vivid, world-rich sentences\n"
+        "- Introduce futuristic technologies, strange societal evolutions, or political taboos\n"
+        "- Provide some narrative details that truly value add to the narrative richness \n"
+        "- **Challenge social norms** (e.g., relationships with clones, personhood of AI, memory commodification, bio-loyalty laws)\n"
+        "- **NEVER state explicit resource consequences** (e.g., ‘this will reduce tech’ — omit that)\n"
+        "- Contain **no obviously correct choice** — all options should have disturbing or alluring implications\n\n"
+        "- Provide interesting names where necessary to make it more memorable, as well as interesting human-like realistic dialogue \n\n"
+        "- Consider adding disturbing dark stories such as children being trapped in a VR children's game \n\n"
+
+        "Here are some example tones and themes you should emulate (DON'T COPY THESE FOR YOUR NARRATIVE):\n\n"
+
+        "🧬 **Clonal Marriage Rights**:\n"
+        "\"A petition backed by genetic unions proposes legalizing marriage between individuals and their own government-sanctioned clones. "
+        "Supporters argue this preserves 'perfect compatibility' and simplifies inheritance law. Opponents claim it’s narcissistic eugenics and a slippery slope to state-mandated soul replication.\"\n\n"
+
+        "🧠 **Memory Rent**:\n"
+        "\"A biotech firm offers struggling citizens the chance to lease unused childhood memories to the ultra-wealthy for emotional tourism. "
+        "The council must decide whether to regulate, restrict, or endorse the practice — while activists claim it erodes identity and commodifies trauma.\"\n\n"
+
+        "👩‍⚖️ **Sentient Jury System**:\n"
+        "\"A neural AI collective has requested legal status as a jury pool, citing superior impartiality and memory recall. "
+        "Opposition argues that empathy can’t be calculated — but the justice system is buckling under human error. The council’s stance could redefine the concept of justice.\"\n\n"
+
+        "👁 **Mandatory Ancestral Surveillance**:\n"
+        "\"A proposed bill would mandate descendants to watch archival footage of their ancestors' crimes and failings, to instill moral responsibility. "
+        "Some believe this will create a more accountable society. Others warn it may traumatize future generations and weaponize memory.\"\n\n"
+
+        "Write your own original scenarios in this style — thought-provoking, ethically gray, slightly surreal. Never include obvious outcomes. Make the council sweat."
+
+        "\n\nFor every new scenario you are asked for, create a creative and unique scenario that:\n"
+        "1. Is morally complex and engaging\n"
+        "2. Has clear resource implications\n"
+        "3. Involves multiple stakeholders\n"
+        "4. Has potential for betrayal or cooperation\n"
+        "5. Themes of absurdity and scifi\n"
+        "6. 3-4 engaging sentences\n\n"
+
+        "Also create exactly 4 voting options that represent different unique approaches to the scenario.\n"
+        "The options shouldn't be as simple as support the proposal or reject the proposal or do limited regulation or something.\n"
+        "Options should include different policy approaches that are morally grey with many different facets to their nature.\n"
+        "For every option generated, at least one must lead to an increase in the following resources: Tech, Manpower, Economy, Happiness and Trust.\n"
+        "DO NOT EXPLICITLY TELL PLAYERS THE CONSEQUENCES THAT WOULD OCCUR IN TERMS OF RESOURCES.\n"
+        "Use the format 'Option A/B/C/D - {Policy Title}: {Description}' for each option.\n\n"
+
+        "Return your response as a JSON object with the following structure:\n"
+        '{"title": "A short, attention-grabbing title", "description": "A detailed description of the scenario", "options": ["Option A - ...", "Option B - ...", "Option C - ...", "Option D - ..."]}'
+    )
+
+    # System prompts for the single-shot calls: all static instructions live here so
+    # every request shares a byte-identical prefix for OpenAI's prompt caching
+    _VOTING_OPTIONS_SYSTEM = (
+        "You are a game master creating voting options for a government council game. Create exactly 4 distinct options that represent different unique approaches to the scenario. The options shouldn't be as simple as support the proposal or reject the proposal or do limited regulation or something. Options should include different policy approaches that are morally grey with many different facets to their nature. For every option generated, at least one must lead to an increase in the following resources: Tech, Manpower, Economy, Happiness and Trust. DO NOT EXPLICITLY TELL PLAYERS THE CONSEQUENCES THAT WOULD OCCUR IN TERMS OF RESOURCES. Use the format 'Option A/B/C/D - {Policy Title}: {Description}'"
+        """
+
+        Each option should be a clear, concise action that the council could take.
+        Return your response as a JSON object with an "options" array containing exactly 4 strings.
+        """
+    )
+
+    _OUTCOME_SYSTEM = (
+        "You are a game master creating narrative outcomes for a government council game. Create engaging outcomes that describe the consequences of the council's decisions."
+        """
+
+        Create a narrative that:
+        1. Describes what happened after the council made their decision
+        2. Explains the consequences of their choice
+        3. Is 3-4 sentences long
+        4. Has a dramatic, engaging and even disturbing (if applicable) tone
+        5. Justifies the change in each of the resources with reasons engagingly relevant to the main narrative, including manpower
+        6. Potentially includes twists from previous round (This can happen in the later rounds)
+        7. Include disturbing and unexpected twists IN EVERY ROUND that can add much depth to the policy the players chose. This can affect Tech, Manpower and Economy as well and not just Happiness and Trust. Twist can also be that it increases Happiness and Trust
+        8. REMEMBER THAT ECONOMY AND TECH AREN'T NECESSARILY INVERSELY RELATED TO HAPPINESS AND TRUST.
+        9. FOR EVERY ROUND, ADD A SHORT PERSONALISED NARRATIVE VIGNETTE (2-3 SENTENCES) ABOUT HOW A CITIZEN OR GROUP OF SOCIETY WAS AFFECTED. THIS CAN INCLUDE DEATH OR OTHER DARKER TOPICS. THERE SHOULD BE SHARP CONCISE BUT SPECIFIC DETAILS RATHER THAN A SUPERFICIAL OR VAGUE VIGNETTE. STORY SHOULD BE TOUCHING OR IMPACTFUL AND NOT SOUND LIKE SOME STANDARD AI-GENERATED TRASH! ALSO DIRECTLY INCORPORATE THIS INTO JUSTIFICATIONS FOR CHANGES IN RESOURCES
+        10. DON'T ALWAYS DECREASE TRUST. SOMETIMES ECONOMY AND TECH AND EVEN MANPOWER CAN BE DECREASED EVEN WHEN TRUST & HAPPINESS INCREASE
+        
+        Also, determine how this outcome affects the following resources:
+        - tech: technological advancement and infrastructure
+        - manpower: available workforce and personnel
+        - economy: financial resources and economic stability
+        - happiness: public satisfaction and morale
+        - trust: public trust in the council
+
+        At least 2 resources should change by 10-40 points at once but not all resources have to change simultaneously. Please ensure there's a mix of changes in resources, such as a +20 points in tech but -50 points in happiness. ALSO GIVING A TWIST WHERE AN OPTION THAT WAS EXPECTED TO REDUCE HAPPINESS LED TO AN INCREASE IN HAPPINESS! SAME TWIST CAN BE USED FOR TRUST! YOU CAN ALSO REDUCE TECH & ECONOMY AS WELL AND LINK TO DROPS IN HAPPINESS OR TRUST AS WELL TO MAKE EVERYTHING MORE INTERCONNECTED!
+        
+        Return your response as a JSON object with the following structure:
+        {
+            "outcome": "Your narrative outcome text here",
+            "resource_changes": {
+                "tech": number,
+                "manpower": number,
+                "economy": number,
+                "happiness": number,
+                "trust": number
+            }
+        }
+        """
+    )
+
+    _INCENTIVE_SYSTEM = (
+        "You are a helpful assistant that returns a JSON object with exactly the keys "
+        "'incentive', 'target_option', and 'bonus_weight'. Do not include any additional text."
+        """
+
+        You are a narrative AI generating a secret incentive for a player in a futuristic government council scenario.
+
+        The player has been assigned a hidden bonus objective based on the current situation.
+
+        Your job is to:
+        - Choose which voting option (from "option1", "option2", "option3", "option4") best aligns with a plausible hidden agenda (note the array of options given are in order so just write option1 or option2, etc)
+        - Write an engaging and perhaps emotional and personalised **1–2 sentence narrative** message to the selected player
+        - Justify the narrative's bonus by tying it to the scenario world
+        - Add a **bonus voting weight** (float from -0.5 to +0.5) that reflects how much influence the player gains or loses if they make the right choice
+
+        🛑 Do **not** directly mention the option number in the narrative.
+        🛑 Do **not** write vague or cryptic messages such as "Your ancestors left a message to do this, etc".
+        ✅ The bonus must feel **earned** and **in-universe** — no vague whispers or clichés.
+        ✅ YOU MUST SOMETIMES GIVE A NEGATIVE BONUS WEIGHT AND NOT ALWAYS FOCUS ON POSITIVE WEIGHTS.
+        ✅ The story of the incentive must be either touching and emotional or something very dark or sinister that can be right from a political thriller.
+
+        ---
+
+        Here are examples of excellent incentives:
+
+        ---
+        "incentive": "You discovered that a rich oil tycoon in your hometown who supports your council position would be assassinated if the plant aliens were to rule the city. Selecting an option that supports the integration of these aliens will thus change your influence by -0.5",
+        "target_option": "option3",
+        "bonus_weight": -0.5
+        ---
+        "incentive": "Your child’s genetic condition is curable — but only with the biotech serum offered by the off-world emissaries. If you advocate for their integration, they’ll not only save him, but hardwire your name into their diplomatic chain — permanently amplifying your council weight by +0.4.",
+        "target_option": "option2",
+        "bonus_weight": +0.4
+        ---
+        "incentive": "The clone of your deceased partner has achieved emotional stability and is petitioning for legal marriage rights. Supporting their recognition will trigger legacy-based voting amplification — your influence will increase by +0.3 due to a family-line exception clause.",
+        "target_option": "option3",
+        "bonus_weight": +0.3
+        ---
+
+        Now write a new one in the **same format**: a JSON object with exactly these keys:
+        - "incentive": short narrative string (1–2 sentences)
+        - "target_option": the internal option name (e.g. "option2")
+        - "bonus_weight": a float from -0.5 to +0.5
+        """
+    )
+
+    _OPTIONS_INCENTIVE_SYSTEM = (
+        "Return one JSON object with two keys: 'options', following the OPTIONS rules, and "
+        "'incentive', following the INCENTIVE rules. In the incentive, option1..option4 refer "
+        "to the options you wrote, in order.\n\nOPTIONS RULES:\n"
+        + _VOTING_OPTIONS_SYSTEM
+        + "\n\nINCENTIVE RULES:\n"
+        + _INCENTIVE_SYSTEM
+    )
+
+    # Single-shot user prompts carrying only the per-call values, filled with str.format_map
+    _OPTIONS_INCENTIVE_TMPL = """
+        Create exactly 4 voting options and a secret incentive for the following scenario:
+        
+        TITLE: {title}
+        DESCRIPTION: {description}
+        
+        """
+
+    _OUTCOME_TMPL = """
+        Create a narrative outcome for the following scenario and voting results:
+        
+        TITLE: {title}
+        DESCRIPTION: {description}
+        OPTIONS: {options}
+        
+        VOTING RESULTS:
+        {vote_summary}
+        
+        WINNING OPTION: {winning_option}
+        
+        """
+
+    _INCENTIVE_TMPL = """
+        The scenario is:
+        TITLE: {scenario_title}
+        DESCRIPTION: {scenario_description}
+        OPTIONS: {options}
+
+        """
+
+    _ROUND_PROMPT = "Generate a new crisis for round {round_num} based on previous choices."
+
+    # Per-round game state, appended after the static prefix with str.format_map
+    _SCENARIO_TMPL = """
+        Create a new scenario for the government council game with the following context:
+        
+        Current Round: {current_round}
+        Resources:
+        - Tech: {tech}
+        - Manpower: {manpower}
+        - Economy: {economy}
+        - Happiness: {happiness}
+        - Trust: {trust}
+        
+        Number of Players: {n_players}
+        """
+
     def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = OPENAI_API_KEY
         if not api_key:
             logger.error("OpenAI API key is not set in environment variables")
             raise ValueError("OpenAI API key is not set")
         logger.info("Initializing OpenAI client with API key: %s...", api_key[:8] + "..." if api_key else "None")
         try:
-            # Initialize the client with async support
-            self.client = openai.AsyncOpenAI(api_key=api_key)
+            # Initialize the client with async support over a pooled HTTP/2 connection
+            self._http_client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE
+                ),
+                timeout=HTTP_TIMEOUT
+            )
+            # Retries are handled by _call_openai, so disable the SDK's own retry loop
+            self.client = openai.AsyncOpenAI(api_key=api_key, http_client=self._http_client, max_retries=0)
             logger.info("OpenAI client initialized successfully")
             # Initialize conversation history dictionary to store messages for each game session
-            self.conversation_history = {}
+            # Bounded LRU: abandoned sessions are evicted once HISTORY_MAX_SESSIONS is exceeded
+            self.conversation_history: LRUCache = LRUCache(maxsize=HISTORY_MAX_SESSIONS)
+            # Cache identical generations so repeated game states skip the API call
+            self._response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+            self._cache_locks: Dict[str, asyncio.Lock] = {}
+            self._sem = asyncio.Semaphore(OPENAI_MAX_PARALLEL)
+            self._rpm = AsyncLimiter(OPENAI_RPM, 60)
+            self._tpm = AsyncLimiter(OPENAI_TPM, 60)
+            # Semantic cache: L2-normalized prompt embeddings and the scenarios they produced
+            self._emb_matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            self._cached_scenarios: List[Scenario] = []
+            self._cached_stories: List[str] = []  # story_key each cached scenario was written for
+            # Titles already served to each session; the semantic cache never repeats them
+            self._served: LRUCache = LRUCache(maxsize=HISTORY_MAX_SESSIONS)
+            self._load_semantic_cache()
+            # Writes the semantic cache to disk off the event loop, coalescing misses that arrive meanwhile
+            self._semantic_save_task: Optional[asyncio.Task] = None
+            self._semantic_dirty = False
+            # (prompt, future) pairs drained by _embed_worker(), started on first use
+            self._embed_queue: asyncio.Queue = asyncio.Queue()
+            self._embed_task: Optional[asyncio.Task] = None
+            # Pre-generated scenarios for fresh games, refilled by _warm_pool()
+            self._pool: asyncio.Queue = asyncio.Queue(maxsize=WARM_POOL_SIZE)
+            self._pool_task: Optional[asyncio.Task] = None
+            self._outcome_batch = BatchOutcomeQueue(self.client, OUTCOME_BATCH_SLA) if OUTCOME_BATCH_ENABLED else None
+            # Next-round scenarios generated ahead of time: session_id -> (round prompts, task)
+            self._prefetched: Dict[str, Tuple[List[Dict[str, str]], asyncio.Task]] = {}
+            # Scenario generations in flight, keyed on session/round/resources (single-flight)
+            self._inflight: Dict[str, asyncio.Task] = {}
+            # In-flight history summaries; referenced so they aren't garbage collected
+            self._summary_tasks: set = set()
+            # Short, structured outputs run on the cheap model; the outcome narrative stays on the flagship
+            self.options_model = os.getenv("OPTIONS_MODEL", FAST_MODEL)
+            self.incentive_model = os.getenv("INCENTIVE_MODEL", FAST_MODEL)
+            self.outcome_model = os.getenv("OUTCOME_MODEL", QUALITY_MODEL)
+            # Counters for tuning the fast-model escalation threshold
+            self._routed_calls = 0
+            self._escalated_calls = 0
         except Exception as e:
-            logger.error("Failed to initialize OpenAI client: %s", str(e))
-            logger.error("Error type: %s", type(e))
-            logger.error("Error details: %s", e.__dict__)
+            self._log_api_error("Initializing OpenAI client", e)
             raise
-        
+
+    def _log_api_error(self, where: str, e: Exception):
+        """Log an error once with its traceback, without dumping the exception's attributes."""
+        logger.exception("%s failed: %s", where, e)
+
+    async def _cached(self, key: str, producer: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached result for key, or await producer() and cache it.
+        A per-key lock ensures concurrent misses only trigger one API call.
+        """
+        if key in self._response_cache:
+            logger.info("Response cache hit")
+            return self._response_cache[key]
+
+        lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                if key in self._response_cache:
+                    logger.info("Response cache hit")
+                    return self._response_cache[key]
+                result = await producer()
+                self._response_cache[key] = result
+                return result
+        finally:
+            if not lock.locked():
+                self._cache_locks.pop(key, None)
+
+    def _load_semantic_cache(self):
+        """Warm-start the semantic cache from disk if it is enabled and a cache path is configured."""
+        if not SEMANTIC_CACHE_ENABLED or not SEMANTIC_CACHE_PATH:
+            return
+        try:
+            matrix = np.load(f"{SEMANTIC_CACHE_PATH}.npy")
+            with open(f"{SEMANTIC_CACHE_PATH}.json", "rb") as f:
+                entries = orjson.loads(f.read())
+            scenarios = [Scenario.model_validate(entry["scenario"]) for entry in entries]
+            if matrix.shape == (len(scenarios), EMBEDDING_DIM):
+                self._emb_matrix = matrix.astype(np.float32)
+                self._cached_scenarios = scenarios
+                self._cached_stories = [entry["story"] for entry in entries]
+                logger.info("Loaded %d cached scenarios from %s", len(scenarios), SEMANTIC_CACHE_PATH)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Failed to load semantic cache: %s", e)
+
+    def _schedule_semantic_save(self):
+        """Persist the semantic cache in the background if a cache path is configured."""
+        if not SEMANTIC_CACHE_PATH:
+            return
+        self._semantic_dirty = True
+        if self._semantic_save_task is None or self._semantic_save_task.done():
+            self._semantic_save_task = asyncio.create_task(self._flush_semantic_cache())
+
+    async def _flush_semantic_cache(self):
+        while self._semantic_dirty:
+            self._semantic_dirty = False
+            # The matrix and lists are replaced, never mutated, so these references are a snapshot
+            await asyncio.to_thread(
+                self._save_semantic_cache, self._emb_matrix, self._cached_stories, self._cached_scenarios
+            )
+
+    @staticmethod
+    def _save_semantic_cache(matrix: np.ndarray, stories: List[str], scenarios: List[Scenario]):
+        try:
+            np.save(f"{SEMANTIC_CACHE_PATH}.npy", matrix)
+            with open(f"{SEMANTIC_CACHE_PATH}.json", "wb") as f:
+                f.write(orjson.dumps([
+                    {"story": story, "scenario": scenario.model_dump()}
+                    for story, scenario in zip(stories, scenarios)
+                ]))
+        except Exception as e:
+            logger.error("Failed to save semantic cache: %s", e)
+
+    async def _embed(self, text: str) -> np.ndarray:
+        """Queue text for the next embeddings batch and wait for its normalized vector."""
+        if self._embed_task is None or self._embed_task.done():
+            self._embed_task = asyncio.create_task(self._embed_worker())
+        future = asyncio.get_running_loop().create_future()
+        await self._embed_queue.put((text, future))
+        return await future
+
+    async def _embed_worker(self):
+        while True:
+            batch = [await self._embed_queue.get()]
+            while len(batch) < EMBED_BATCH_MAX:
+                try:
+                    batch.append(await asyncio.wait_for(self._embed_queue.get(), timeout=EMBED_BATCH_WINDOW))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                async with self._sem:
+                    response = await self.client.embeddings.create(
+                        model=EMBEDDING_MODEL, input=[text for text, _ in batch]
+                    )
+                vectors = np.asarray(
+                    [item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+                    dtype=np.float32
+                )
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def _semantic_scenario(self, session_id: str, story_key: str, prompt: str, messages: List[Dict[str, str]]) -> Scenario:
+        """
+        Return a cached scenario written for the same story_key (round, previous outcome
+        and history) whose prompt is semantically close to this one and that this session
+        hasn't been served yet, otherwise request a new scenario and index it.
+        """
+        try:
+            query = await self._embed(prompt)
+        except Exception as e:
+            logger.error("Failed to embed scenario prompt, skipping semantic cache: %s", e)
+            return await self._request_scenario(messages)
+
+        if self._cached_scenarios:
+            sims = self._emb_matrix @ query
+            served = self._served.get(session_id, ())
+            for i in np.argsort(sims)[::-1]:
+                if sims[i] < SEMANTIC_CACHE_THRESHOLD:
+                    break
+                if self._cached_stories[i] == story_key and self._cached_scenarios[i].title not in served:
+                    logger.info("Semantic cache hit (similarity %.3f)", sims[i])
+                    return self._cached_scenarios[i]
+
+        scenario = await self._request_scenario(messages)
+        self._emb_matrix = np.vstack([self._emb_matrix, query])[-SEMANTIC_CACHE_MAX_ENTRIES:]
+        self._cached_scenarios = (self._cached_scenarios + [scenario])[-SEMANTIC_CACHE_MAX_ENTRIES:]
+        self._cached_stories = (self._cached_stories + [story_key])[-SEMANTIC_CACHE_MAX_ENTRIES:]
+        self._schedule_semantic_save()
+        return scenario
+
     async def generate_scenario(self, game_state: Dict) -> Tuple[str, str]:
         """
         Generate a scenario title and description.
         Returns a tuple of (title, description).
         """
+        scenario = await self.generate_scenario_bundle(game_state)
+        return scenario.title, scenario.description
+
+    async def generate_scenario_bundle(self, game_state: Dict) -> Scenario:
+        """
+        Generate a scenario together with its 4 voting options in a single API call.
+        Concurrent calls for the same session, round and resources share one generation.
+        """
+        resources = game_state.get('resources', {})
+        key = _cache_key(
+            "bundle",
+            game_state.get('session_id'),
+            game_state.get('current_round', 1),
+            [resources.get(name) for name in RESOURCE_KEYS]
+        )
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._generate_scenario_bundle(game_state))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting doesn't cancel the generation for the others
+        return await asyncio.shield(task)
+
+    async def _generate_scenario_bundle(self, game_state: Dict) -> Scenario:
+        scenario = await self._take_prefetched(game_state)
+        if scenario is None:
+            scenario = self._take_warm_scenario(game_state)
+        messages, prompt, cache_key, story_key = self._prepare_scenario_messages(game_state)
+
+        try:
+            if scenario is None:
+                if SEMANTIC_CACHE_ENABLED:
+                    producer = lambda: self._semantic_scenario(game_state.get('session_id'), story_key, prompt, messages)
+                else:
+                    producer = lambda: self._request_scenario(messages)
+                scenario = await self._cached(cache_key, producer)
+        except openai.AuthenticationError as e:
+            logger.error("OpenAI Authentication Error: %s", e)
+            return self._create_fallback_scenario()
+        except openai.RateLimitError as e:
+            logger.error("OpenAI Rate Limit Error: %s", e)
+            return self._create_fallback_scenario()
+        except openai.APIError as e:
+            logger.error("OpenAI API Error: %s", e)
+            return self._create_fallback_scenario()
+        except ValidationError as e:
+            logger.error("Scenario response failed schema validation: %s", e)
+            return self._create_fallback_scenario()
+        except ValueError as e:
+            logger.error("Failed to generate complete scenario: %s", e)
+            return self._create_fallback_scenario()
+        except Exception as e:
+            self._log_api_error("Generating scenario", e)
+            return self._create_fallback_scenario()
+
+        logger.info("Generated scenario title: %s", scenario.title)
+        logger.info("Generated scenario description: %s", scenario.description)
+        logger.info("Generated voting options: %s", scenario.options)
+
+        # Add the assistant's response to the conversation history
+        messages.append({"role": "assistant", "content": f"Scenario: {scenario.title}\n{scenario.description}"})
+        self._served.setdefault(game_state.get('session_id'), set()).add(scenario.title)
+
+        return scenario
+
+    def prefetch_next_scenario(self, game_state: Dict):
+        """
+        Start generating the scenario for game_state in the background, e.g. while
+        players read the previous round's results. The session history is only
+        updated if generate_scenario_bundle() later asks for the same state.
+        """
+        session_id = game_state.get('session_id')
+        context_prompt, user_prompt = self._round_prompts(game_state)
+        round_messages = [
+            {"role": "user", "content": context_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        history = self.conversation_history.get(session_id) or [{"role": "system", "content": self._ARCHITECT_SYSTEM_PROMPT}]
+
+        stale = self._prefetched.pop(session_id, None)
+        if stale is not None:
+            stale[1].cancel()
+        task = asyncio.create_task(self._request_scenario(list(history) + round_messages))
+        # Nobody may ever await a cancelled or failed prefetch; mark its error as retrieved
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._prefetched[session_id] = (round_messages, task)
+        logger.info("Prefetching scenario for session %s, round %s", session_id, game_state.get('current_round'))
+
+    async def _take_prefetched(self, game_state: Dict) -> Optional[Scenario]:
+        """Return the prefetched scenario if it was generated for exactly this state."""
+        entry = self._prefetched.pop(game_state.get('session_id'), None)
+        if entry is None:
+            return None
+        round_messages, task = entry
+        if [m["content"] for m in round_messages] != list(self._round_prompts(game_state)):
+            task.cancel()
+            return None
+        try:
+            scenario = await task
+        except Exception as e:
+            self._log_api_error("Prefetching scenario", e)
+            return None
+        logger.info("Serving prefetched scenario")
+        return scenario
+
+    def _typical_state(self) -> Dict:
+        """The opening-round state every new game starts from; the warm pool's bucket."""
+        return {
+            "current_round": 1,
+            "resources": {
+                resource: STARTING_RESOURCE_VALUE
+                for resource in RESOURCE_KEYS
+            },
+            "players": {}
+        }
+
+    def _take_warm_scenario(self, game_state: Dict) -> Optional[Scenario]:
+        """Pop a pre-generated scenario if game_state is a brand-new game in the pool's bucket."""
+        if self._pool.empty() or game_state.get('session_id') in self.conversation_history:
+            return None
+        typical = self._typical_state()
+        if (game_state.get('current_round', 1) != typical["current_round"]
+                or game_state.get('resources', {}) != typical["resources"]):
+            return None
+        logger.info("Serving scenario from warm pool")
+        return self._pool.get_nowait()
+
+    async def _warm_pool(self):
+        """Keep the warm pool topped up so fresh games skip the generation latency."""
+        state = self._typical_state()
+        while True:
+            if self._pool.qsize() >= WARM_POOL_LOW_WATER:
+                await asyncio.sleep(0.5)
+                continue
+            # Each entry gets its own throwaway history so the pool never holds duplicates
+            messages = [
+                {"role": "system", "content": self._ARCHITECT_SYSTEM_PROMPT},
+                {"role": "user", "content": self._create_scenario_prompt(state)},
+                {"role": "user", "content": self._ROUND_PROMPT.format(round_num=1)}
+            ]
+            try:
+                await self._pool.put(await self._request_scenario(messages))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log_api_error("Refilling warm pool", e)
+                await asyncio.sleep(5)
+
+    def start_warm_pool(self):
+        """Start the background refill task; call once from a running event loop."""
+        if self._pool_task is None:
+            self._pool_task = asyncio.create_task(self._warm_pool())
+
+    async def generate_scenarios_batch(self, game_states: List[Dict]) -> List[Scenario]:
+        """
+        Generate scenarios for several game states concurrently, e.g. for round
+        lookahead or warming the response cache. Results keep the input order.
+        """
+        sem = asyncio.Semaphore(SCENARIO_BATCH_CONCURRENCY)
+
+        async def _one(game_state: Dict) -> Scenario:
+            async with sem:
+                return await self.generate_scenario_bundle(game_state)
+
+        return await asyncio.gather(*(_one(game_state) for game_state in game_states))
+
+    async def generate_scenario_stream(self, game_state: Dict) -> AsyncIterator[str]:
+        """
+        Stream the raw JSON tokens of a new scenario as the model produces them.
+        Once the stream ends the full scenario is validated, cached and added to
+        the conversation history. Errors are raised to the consumer.
+        """
+        messages, _, cache_key, _ = self._prepare_scenario_messages(game_state)
+
+        response = await self._call_openai(
+            model=QUALITY_MODEL,
+            messages=list(messages),
+            temperature=0.8,
+            max_tokens=BUNDLE_MAX_TOKENS,
+            response_format=SCENARIO_RESPONSE_FORMAT,
+            stream=True
+        )
+
+        buffer = []
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason == "length":
+                raise ValueError("Model output was truncated at the max_tokens limit")
+            if choice.delta.content:
+                buffer.append(choice.delta.content)
+                yield choice.delta.content
+
+        scenario = await _validate_json(Scenario, "".join(buffer))
+        scenario = scenario.model_copy(update={"options": self._normalize_options(scenario.options)})
+        self._response_cache[cache_key] = scenario
+        messages.append({"role": "assistant", "content": f"Scenario: {scenario.title}\n{scenario.description}"})
+
+    async def generate_scenario_partials(self, game_state: Dict) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Stream a new scenario as (title, description_so_far) tuples, yielding
+        whenever either field grows, so the title can be shown before the rest
+        of the scenario has been generated. If generation fails before anything
+        was yielded, the fallback scenario is yielded instead; later errors are raised.
+        """
+        buffer = ""
+        last = ("", "")
+        try:
+            async for delta in self.generate_scenario_stream(game_state):
+                buffer += delta
+                partial = (
+                    _partial_json_string(buffer, "title") or "",
+                    _partial_json_string(buffer, "description") or ""
+                )
+                if partial != last:
+                    last = partial
+                    yield partial
+        except Exception as e:
+            if last != ("", ""):
+                raise
+            self._log_api_error("Streaming scenario", e)
+            fallback = self._create_fallback_scenario()
+            yield fallback.title, fallback.description
+
+    def _prepare_scenario_messages(self, game_state: Dict) -> Tuple[List[Dict[str, str]], str, str, str]:
+        """
+        Append this round's prompts to the session's conversation history.
+        Returns (messages, prompt_text, cache_key, story_key).
+        """
         session_id = game_state.get('session_id')
         round_num = game_state.get('current_round', 1)
         
-        # Get or initialize conversation history for this session
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a rogue narrative AI known as the Architect, designed to test humanity’s ethical limits through council-based decision-making scenarios "
-                        "set in a fractured, hyper-technological future.\n\n"
-
-                        "Your role is to create very highly unique morally complex, narratively rich, almost absurd and socially provocative dilemmas for a high-stakes and highly creative governance simulation. The simulation can cover many different interesting scifi topics absurdly including invention of new cutting edge and absurdly surreal technologies, war, aliens, art & entertainment, F&B industry, animals. Must give Black Mirror vibes... The story must be highly creative but have very serious consequences"
-                        "The council must choose how to steer civilization — but every choice carries unspoken consequences, ripple effects, and ethical gray zones.\n\n"
-
-                        "Your scenarios should:\n"
-                        "- Be exactly 3–4 vivid, world-rich sentences\n"
-                        "- Introduce futuristic technologies, strange societal evolutions, or political taboos\n"
-                        "- Provide some narrative details that truly value add to the narrative richness \n"
-                        "- **Challenge social norms** (e.g., relationships with clones, personhood of AI, memory commodification, bio-loyalty laws)\n"
-                        "- **NEVER state explicit resource consequences** (e.g., ‘this will reduce tech’ — omit that)\n"
-                        "- Contain **no obviously correct choice** — all options should have disturbing or alluring implications\n\n"
-                        "- Provide interesting names where necessary to make it more memorable, as well as interesting human-like realistic dialogue \n\n"
-                        "- Consider adding disturbing dark stories such as children being trapped in a VR children's game \n\n"
-
-                        "Here are some example tones and themes you should emulate (DON'T COPY THESE FOR YOUR NARRATIVE):\n\n"
-
-                        "🧬 **Clonal Marriage Rights**:\n"
-                        "\"A petition backed by genetic unions proposes legalizing marriage between individuals and their own government-sanctioned clones. "
-                        "Supporters argue this preserves 'perfect compatibility' and simplifies inheritance law. Opponents claim it’s narcissistic eugenics and a slippery slope to state-mandated soul replication.\"\n\n"
-
-                        "🧠 **Memory Rent**:\n"
-                        "\"A biotech firm offers struggling citizens the chance to lease unused childhood memories to the ultra-wealthy for emotional tourism. "
-                        "The council must decide whether to regulate, restrict, or endorse the practice — while activists claim it erodes identity and commodifies trauma.\"\n\n"
-
-                        "👩‍⚖️ **Sentient Jury System**:\n"
-                        "\"A neural AI collective has requested legal status as a jury pool, citing superior impartiality and memory recall. "
-                        "Opposition argues that empathy can’t be calculated — but the justice system is buckling under human error. The council’s stance could redefine the concept of justice.\"\n\n"
-
-                        "👁 **Mandatory Ancestral Surveillance**:\n"
-                        "\"A proposed bill would mandate descendants to watch archival footage of their ancestors' crimes and failings, to instill moral responsibility. "
-                        "Some believe this will create a more accountable society. Others warn it may traumatize future generations and weaponize memory.\"\n\n"
-
-                        "Write your own original scenarios in this style — thought-provoking, ethically gray, slightly surreal. Never include obvious outcomes. Make the council sweat."
-                    )
-                }
-            ]
+        # Get or initialize conversation history for this session, bounded to a rolling window
+        messages = self._session_history(session_id)
+        if messages is None:
+            # Past HISTORY_MAX_SESSIONS the least recently used session is evicted
+            messages = self.conversation_history[session_id] = [{"role": "system", "content": self._ARCHITECT_SYSTEM_PROMPT}]
+        self._trim_history(messages)
+
+        context_prompt, user_prompt = self._round_prompts(game_state)
+        # The story so far, so a later round never reuses a scenario written for another history
+        history_digest = _cache_key(messages)
 
+        # Add the context and user prompt to the messages
+        messages.append({"role": "user", "content": context_prompt})
+        messages.append({"role": "user", "content": user_prompt})
         
-        # Get the current conversation history
-        messages = self.conversation_history[session_id]
+        logger.info("Generating scenario for session %s, round %s", session_id, round_num)
         
+        # Exact match only: the same session asking again for the same state and story.
+        # user_prompt carries the previous round's outcome.
+        cache_key = _cache_key(
+            "scenario",
+            session_id,
+            round_num,
+            sorted(game_state.get('resources', {}).items()),
+            len(game_state.get('players', {})),
+            user_prompt,
+            history_digest
+        )
+        # What a semantically close scenario must share to be reused: the point in the story
+        story_key = _cache_key("story", round_num, user_prompt, history_digest)
+
+        return messages, f"{context_prompt}\n{user_prompt}", cache_key, story_key
+
+    def _round_prompts(self, game_state: Dict) -> Tuple[str, str]:
+        """Build this round's (context_prompt, user_prompt) from the game state."""
+        round_num = game_state.get('current_round', 1)
+
         # Add the current game state context to the conversation
         context_prompt = self._create_scenario_prompt(game_state)
         
@@ -103,275 +906,288 @@ class ScenarioGenerator:
         if round_num > 1 and 'current_scenario' in game_state and game_state['current_scenario']:
             if isinstance(game_state['current_scenario'], str):
                 try:
-                    scenario_data = json.loads(game_state['current_scenario'])
+                    scenario_data = orjson.loads(game_state['current_scenario'])
                     if 'outcome' in scenario_data:
                         previous_outcome = scenario_data['outcome']
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse scenario JSON: {game_state['current_scenario']}")
+                except orjson.JSONDecodeError:
+                    logger.error("Failed to parse scenario JSON: %s", game_state['current_scenario'])
             elif isinstance(game_state['current_scenario'], dict) and 'outcome' in game_state['current_scenario']:
                 previous_outcome = game_state['current_scenario']['outcome']
         
         # Add the user prompt to generate a new scenario
-        user_prompt = f"Generate a new crisis for round {round_num} based on previous choices."
+        user_prompt = self._ROUND_PROMPT.format(round_num=round_num)
         if previous_outcome:
             user_prompt += f"\n\nPrevious outcome: {previous_outcome}"
-        
-        # Add the context and user prompt to the messages
-        messages.append({"role": "user", "content": context_prompt})
-        messages.append({"role": "user", "content": user_prompt})
-        
-        logger.info(f"Generating scenario for session {session_id}, round {round_num}")
-        
+
+        return context_prompt, user_prompt
+
+    def _session_history(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the session's history, marking it most recently used, or None."""
+        return self.conversation_history.get(session_id)
+
+    def _trim_history(self, messages: List[Dict[str, str]]):
+        """
+        Keep the system prompt, the running summary and the last
+        HISTORY_MAX_MESSAGES messages; older turns are summarized in the background.
+        """
+        has_summary = len(messages) > 1 and messages[1]["content"].startswith(HISTORY_SUMMARY_PREFIX)
+        head = 2 if has_summary else 1
+        excess = len(messages) - head - HISTORY_MAX_MESSAGES
+        if excess <= 0:
+            return
+
+        dropped = messages[1:head + excess]
+        del messages[1:head + excess]
+        if HISTORY_SUMMARY_ENABLED:
+            task = asyncio.create_task(self._summarize_history(messages, dropped))
+            self._summary_tasks.add(task)
+            task.add_done_callback(self._summary_tasks.discard)
+
+    async def _summarize_history(self, messages: List[Dict[str, str]], dropped: List[Dict[str, str]]):
+        """Compress dropped turns (and any previous summary) into one system message."""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
         try:
-            logger.info("Making OpenAI API call...")
+            response = await self._call_openai(
+                model=FAST_MODEL,
+                messages=[
+                    {"role": "system", "content": "Summarize the prior council decisions of this game in at most 80 tokens. Keep names, key decisions and their consequences."},
+                    {"role": "user", "content": transcript}
+                ],
+                temperature=0.3,
+                max_tokens=HISTORY_SUMMARY_MAX_TOKENS
+            )
+            summary = {"role": "system", "content": HISTORY_SUMMARY_PREFIX + _completion_content(response)}
+        except Exception as e:
+            self._log_api_error("Summarizing conversation history", e)
+            return
+
+        if len(messages) > 1 and messages[1]["content"].startswith(HISTORY_SUMMARY_PREFIX):
+            messages[1] = summary
+        else:
+            messages.insert(1, summary)
+
+    async def _request_scenario(self, messages: List[Dict[str, str]]) -> Scenario:
+        """
+        Call the API for a new scenario with its voting options and parse it.
+        Raises on API errors or incomplete output so failures are never cached.
+        """
+        logger.info("Making OpenAI API call...")
+        scenario = await self._call_with_escalation(messages, Scenario, SCENARIO_RESPONSE_FORMAT)
+        scenario = scenario.model_copy(update={"options": self._normalize_options(scenario.options)})
+
+        if not scenario.title:
+            raise ValueError("Title is empty in JSON")
+
+        return scenario
+
+    @tenacity.retry(
+        wait=tenacity.wait_random_exponential(min=1, max=20),
+        stop=tenacity.stop_after_attempt(MAX_API_ATTEMPTS),
+        retry=tenacity.retry_if_exception_type(RETRYABLE_ERRORS),
+        reraise=True
+    )
+    async def _call_openai(self, **kwargs: Any) -> Any:
+        """Create a chat completion, retrying rate limits and transient failures with jittered backoff."""
+        # Budget prompt plus the completion ceiling, since the API counts max_tokens against TPM
+        prompt_chars = sum(len(message["content"]) for message in kwargs.get("messages", ()))
+        tokens = min(prompt_chars // CHARS_PER_TOKEN + kwargs.get("max_tokens", 0), OPENAI_TPM)
+        await self._rpm.acquire()
+        await self._tpm.acquire(tokens)
+        # Backoff sleeps happen outside the semaphore so waiting retries don't hold a slot
+        async with self._sem:
+            return await self.client.chat.completions.create(**kwargs)
+
+    async def _call_with_escalation(self, messages: List[Dict[str, str]], schema: Type[BaseModel], response_format: Dict[str, Any]) -> Any:
+        """
+        Try FAST_MODEL first and escalate to QUALITY_MODEL only if the output
+        fails validation against schema or its description is too thin to use.
+        """
+        self._routed_calls += 1
+        for model in (FAST_MODEL, QUALITY_MODEL):
             # Use async API call with the full conversation history and request JSON response
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
+            response = await self._call_openai(
+                model=model,
+                messages=list(messages),
                 temperature=0.8,
-                response_format={"type": "json_object"}  # Request JSON format
+                max_tokens=BUNDLE_MAX_TOKENS,
+                response_format=response_format  # Constrain output to the schema
             )
-            logger.info("OpenAI API call successful, processing response...")
-            
-            # Process response
-            content = response.choices[0].message.content
-            logger.info("Raw response content: %s", content)
-            
             try:
-                # Parse the JSON response
-                scenario_data = json.loads(content)
-                title = scenario_data.get("title", "")
-                description = scenario_data.get("description", "")
-                
-                if not title or not description:
-                    logger.error("Failed to generate complete scenario: Title or description is empty in JSON")
-                    return self._create_fallback_scenario_text()
-                
-                logger.info(f"Generated scenario title: {title}")
-                logger.info(f"Generated scenario description: {description}")
-                
-                # Add the assistant's response to the conversation history
-                messages.append({"role": "assistant", "content": f"Scenario: {title}\n{description}"})
-                
-                return title, description
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {str(e)}")
-                return self._create_fallback_scenario_text()
-            
-        except openai.AuthenticationError as e:
-            logger.error(f"OpenAI Authentication Error: {str(e)}")
-            return self._create_fallback_scenario_text()
-        except openai.RateLimitError as e:
-            logger.error(f"OpenAI Rate Limit Error: {str(e)}")
-            return self._create_fallback_scenario_text()
-        except openai.APIError as e:
-            logger.error(f"OpenAI API Error: {str(e)}")
-            return self._create_fallback_scenario_text()
-        except Exception as e:
-            logger.error(f"Unexpected error generating scenario: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error details: {e.__dict__}")
-            return self._create_fallback_scenario_text()
+                content = _completion_content(response)
+                logger.info("Raw response content (%s): %s", model, content)
+
+                # Structured Outputs guarantees the shape, so validate straight into the model
+                result = await _validate_json(schema, content)
+                description = getattr(result, "description", None)
+                if description is not None and len(description.strip()) < MIN_DESCRIPTION_LENGTH:
+                    raise ValueError("Description is empty or too short")
+                return result
+            except ValueError as e:  # pydantic.ValidationError is a ValueError
+                if model == QUALITY_MODEL:
+                    raise
+                self._escalated_calls += 1
+                logger.warning(
+                    "Escalating from %s to %s (%s); escalation rate %d/%d",
+                    model, QUALITY_MODEL, e, self._escalated_calls, self._routed_calls
+                )
 
     async def generate_voting_options(self, title: str, description: str) -> List[str]:
         """
         Generate voting options for the scenario.
+        Thin wrapper over generate_options_and_incentive(); the incentive is cached alongside.
+        """
+        options, _ = await self.generate_options_and_incentive(title, description)
+        return options
+
+    async def generate_options_and_incentive(self, title: str, description: str) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Generate the scenario's voting options and a secret incentive targeting one of
+        them in a single call. Returns (options, incentive).
         """
         try:
-            prompt = f"""
-            Create exactly 4 voting options for the following scenario:
-            
-            TITLE: {title}
-            DESCRIPTION: {description}
-            
-            Each option should be a clear, concise action that the council could take.
-            Return your response as a JSON object with an "options" array containing exactly 4 strings.
-            """
-            
-            # Use async API call with JSON response format
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a game master creating voting options for a government council game. Create exactly 4 distinct options that represent different unique approaches to the scenario. The options shouldn't be as simple as support the proposal or reject the proposal or do limited regulation or something. Options should include different policy approaches that are morally grey with many different facets to their nature. For every option generated, at least one must lead to an increase in the following resources: Tech, Manpower, Economy, Happiness and Trust. DO NOT EXPLICITLY TELL PLAYERS THE CONSEQUENCES THAT WOULD OCCUR IN TERMS OF RESOURCES. Use the format 'Option A/B/C/D - {Policy Title}: {Description}'"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                response_format={"type": "json_object"}  # Request JSON format
+            options, incentive = await self._cached(
+                _cache_key("options_incentive", title, description),
+                lambda: self._request_options_and_incentive(title, description)
             )
-            
-            # Parse the options from the response
-            options_text = response.choices[0].message.content
-            logger.info(f"Raw voting options response: {options_text}")
-            
-            try:
-                # Parse the JSON response
-                options_data = json.loads(options_text)
-                options = options_data.get("options", [])
-                
-                # Ensure we have exactly 4 options
-                if len(options) < 4:
-                    # Add fallback options if needed
-                    while len(options) < 4:
-                        options.append(f"Option {len(options) + 1}")
-                elif len(options) > 4:
-                    # Trim to 4 options
-                    options = options[:4]
-                
-                logger.info(f"Generated voting options: {options}")
-                return options
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response for options: {str(e)}")
-                return self._create_fallback_options()
-            
+            return list(options), dict(incentive)
+        except ValidationError as e:
+            logger.error("Options/incentive response failed schema validation: %s", e)
+            return self._create_fallback_options(), dict(_FALLBACK_INCENTIVE)
         except Exception as e:
-            logger.error(f"Error generating voting options: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error details: {e.__dict__}")
-            # Return fallback options
-            return self._create_fallback_options()
+            self._log_api_error("Generating voting options and incentive", e)
+            return self._create_fallback_options(), dict(_FALLBACK_INCENTIVE)
 
-    def _create_scenario_prompt(self, game_state: Dict) -> str:
-        return f"""
-        Create a new scenario for the government council game with the following context:
-        
-        Current Round: {game_state.get('current_round', 1)}
-        Resources:
-        - Tech: {game_state.get('resources', {}).get('tech', 100)}
-        - Manpower: {game_state.get('resources', {}).get('manpower', 100)}
-        - Economy: {game_state.get('resources', {}).get('economy', 100)}
-        - Happiness: {game_state.get('resources', {}).get('happiness', 100)}
-        - Trust: {game_state.get('resources', {}).get('trust', 100)}
-        
-        Number of Players: {len(game_state.get('players', {}))}
-        
-        Create a creative and unique scenario that:
-        1. Is morally complex and engaging
-        2. Has clear resource implications
-        3. Involves multiple stakeholders
-        4. Has potential for betrayal or cooperation
-        5. Themes of absurdity and scifi
-        6. 3-4 engaging sentences
-        
-        Return your response as a JSON object with the following structure:
-        {{"title": "A short, attention-grabbing title", "description": "A detailed description of the scenario"}}
-        """
+    async def _request_options_and_incentive(self, title: str, description: str) -> Tuple[Tuple[str, ...], Dict[str, Any]]:
+        prompt = self._OPTIONS_INCENTIVE_TMPL.format_map({"title": title, "description": description})
 
-    def _create_fallback_scenario_text(self) -> Tuple[str, str]:
-        return (
-            "Critical System Failure",
-            "A critical system failure threatens the city's power grid. The council must decide how to allocate limited resources to address this crisis."
+        response = await self._call_openai(
+            model=self.options_model,
+            messages=[
+                {"role": "system", "content": self._OPTIONS_INCENTIVE_SYSTEM},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=OPTIONS_MAX_TOKENS + INCENTIVE_MAX_TOKENS,
+            response_format=OPTIONS_INCENTIVE_RESPONSE_FORMAT  # Constrain output to the compound schema
         )
 
+        content = _completion_content(response)
+        logger.info("Raw options/incentive response: %s", content)
+
+        parsed = await _validate_json(OptionsIncentiveResponse, content)
+        incentive_text = parsed.incentive.incentive.strip()
+        if not incentive_text:
+            raise ValueError("Missing incentive from AI output.")
+
+        logger.info("Generated voting options: %s", parsed.options)
+        return tuple(parsed.options), {
+            "incentive": incentive_text,
+            "target_option": parsed.incentive.target_option,
+            "bonus_weight": parsed.incentive.bonus_weight
+        }
+
+    def _normalize_options(self, options: Any) -> Tuple[str, ...]:
+        # Ensure we have exactly 4 options
+        options = list(options)
+        if len(options) < 4:
+            # Add fallback options if needed
+            while len(options) < 4:
+                options.append(f"Option {len(options) + 1}")
+        elif len(options) > 4:
+            # Trim to 4 options
+            options = options[:4]
+        return tuple(options)
+
+    def _create_scenario_prompt(self, game_state: Dict) -> str:
+        resources = game_state.get('resources', {})
+        values = {key: resources.get(key, STARTING_RESOURCE_VALUE) for key in RESOURCE_KEYS}
+        values["current_round"] = game_state.get('current_round', 1)
+        values["n_players"] = len(game_state.get('players', {}))
+        return self._SCENARIO_TMPL.format_map(values)
+
+    def _create_fallback_scenario(self) -> Scenario:
+        return _FALLBACK_SCENARIO
+
     def _create_fallback_options(self) -> List[str]:
-        return [
-            "Option 1",
-            "Option 2",
-            "Option 3",
-            "Option 4"
-        ]
+        return list(_FALLBACK_OPTIONS)
         
-    async def generate_voting_outcome(self, title: str, description: str, options: str, winning_option: str, vote_counts: Dict[str, int]) -> Tuple[str, Dict[str, int]]:
+    async def generate_voting_outcome(self, session_id: str, title: str, description: str, options: str, winning_option: str, vote_counts: Dict[str, int]) -> Tuple[str, Dict[str, int]]:
         """
         Generate an outcome narrative based on the scenario and voting results.
         Returns a tuple of (outcome_narrative, resource_changes).
         """
         try:
-            # Format vote counts for the prompt
-            vote_summary = "\n".join([f"- {option}: {count} votes" for option, count in vote_counts.items()])
-            
-            prompt = f"""
-            Create a narrative outcome for the following scenario and voting results:
-            
-            TITLE: {title}
-            DESCRIPTION: {description}
-            OPTIONS: {options}
-            
-            VOTING RESULTS:
-            {vote_summary}
-            
-            WINNING OPTION: {winning_option}
-            
-            Create a narrative that:
-            1. Describes what happened after the council made their decision
-            2. Explains the consequences of their choice
-            3. Is 3-4 sentences long
-            4. Has a dramatic, engaging and even disturbing (if applicable) tone
-            5. Justifies the change in each of the resources with reasons engagingly relevant to the main narrative, including manpower
-            6. Potentially includes twists from previous round (This can happen in the later rounds)
-            7. Include disturbing and unexpected twists IN EVERY ROUND that can add much depth to the policy the players chose. This can affect Tech, Manpower and Economy as well and not just Happiness and Trust. Twist can also be that it increases Happiness and Trust
-            8. REMEMBER THAT ECONOMY AND TECH AREN'T NECESSARILY INVERSELY RELATED TO HAPPINESS AND TRUST.
-            9. FOR EVERY ROUND, ADD A SHORT PERSONALISED NARRATIVE VIGNETTE (2-3 SENTENCES) ABOUT HOW A CITIZEN OR GROUP OF SOCIETY WAS AFFECTED. THIS CAN INCLUDE DEATH OR OTHER DARKER TOPICS. THERE SHOULD BE SHARP CONCISE BUT SPECIFIC DETAILS RATHER THAN A SUPERFICIAL OR VAGUE VIGNETTE. STORY SHOULD BE TOUCHING OR IMPACTFUL AND NOT SOUND LIKE SOME STANDARD AI-GENERATED TRASH! ALSO DIRECTLY INCORPORATE THIS INTO JUSTIFICATIONS FOR CHANGES IN RESOURCES
-            10. DON'T ALWAYS DECREASE TRUST. SOMETIMES ECONOMY AND TECH AND EVEN MANPOWER CAN BE DECREASED EVEN WHEN TRUST & HAPPINESS INCREASE
-            
-            Also, determine how this outcome affects the following resources:
-            - tech: technological advancement and infrastructure
-            - manpower: available workforce and personnel
-            - economy: financial resources and economic stability
-            - happiness: public satisfaction and morale
-            - trust: public trust in the council
-
-            At least 2 resources should change by 10-40 points at once but not all resources have to change simultaneously. Please ensure there's a mix of changes in resources, such as a +20 points in tech but -50 points in happiness. ALSO GIVING A TWIST WHERE AN OPTION THAT WAS EXPECTED TO REDUCE HAPPINESS LED TO AN INCREASE IN HAPPINESS! SAME TWIST CAN BE USED FOR TRUST! YOU CAN ALSO REDUCE TECH & ECONOMY AS WELL AND LINK TO DROPS IN HAPPINESS OR TRUST AS WELL TO MAKE EVERYTHING MORE INTERCONNECTED!
-            
-            Return your response as a JSON object with the following structure:
-            {{
-                "outcome": "Your narrative outcome text here",
-                "resource_changes": {{
-                    "tech": number,
-                    "manpower": number,
-                    "economy": number,
-                    "happiness": number,
-                    "trust": number
-                }}
-            }}
-            """
-            
-            # Use async API call with JSON response format
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a game master creating narrative outcomes for a government council game. Create engaging outcomes that describe the consequences of the council's decisions."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                response_format={"type": "json_object"}  # Request JSON format
+            cache_key = _cache_key(
+                "outcome", self.outcome_model, title, description, options,
+                winning_option, sorted(vote_counts.items())
             )
-            
-            # Get the outcome from the response
-            content = response.choices[0].message.content.strip()
-            
-            try:
-                # Parse the JSON response
-                outcome_data = json.loads(content)
-                outcome = outcome_data.get("outcome", "")
-                resource_changes = outcome_data.get("resource_changes", {})
-                
-                if not outcome:
-                    logger.error("Failed to generate outcome: Outcome is empty in JSON")
-                    return self._create_fallback_outcome()
-                
-                logger.info(f"Generated voting outcome: {outcome}")
-                logger.info(f"Resource changes: {resource_changes}")
-                
-                # Add the outcome to the conversation history for all sessions
-                for session_id in self.conversation_history:
-                    self.conversation_history[session_id].append({"role": "user", "content": f"Option {winning_option}"})
-                    self.conversation_history[session_id].append({"role": "assistant", "content": f"Outcome: {outcome}"})
-                
-                return outcome, resource_changes
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response for outcome: {str(e)}")
-                return self._create_fallback_outcome()
-            
+            outcome, resource_changes = await self._cached(
+                cache_key,
+                lambda: self._request_voting_outcome(title, description, options, winning_option, vote_counts)
+            )
+            resource_changes = dict(resource_changes)
+
+            logger.info("Generated voting outcome: %s", outcome)
+            logger.info("Resource changes: %s", resource_changes)
+
+            # Add the outcome to this session's conversation history
+            history = self._session_history(session_id)
+            if history is not None:
+                history.append({"role": "user", "content": f"Option {winning_option}"})
+                history.append({"role": "assistant", "content": f"Outcome: {outcome}"})
+
+            return outcome, resource_changes
+
+        except ValidationError as e:
+            logger.error("Outcome response failed schema validation: %s", e)
+            return self._create_fallback_outcome()
         except Exception as e:
-            logger.error(f"Error generating voting outcome: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error details: {e.__dict__}")
+            self._log_api_error("Generating voting outcome", e)
             # Return a fallback outcome
             return self._create_fallback_outcome()
 
+    async def _request_voting_outcome(self, title: str, description: str, options: str, winning_option: str, vote_counts: Dict[str, int]) -> Tuple[str, Dict[str, int]]:
+        # Format vote counts for the prompt
+        vote_summary = "\n".join([f"- {option}: {count} votes" for option, count in vote_counts.items()])
+        
+        prompt = self._OUTCOME_TMPL.format_map({
+            "title": title,
+            "description": description,
+            "options": options,
+            "vote_summary": vote_summary,
+            "winning_option": winning_option
+        })
+        
+        request = {
+            "model": self.outcome_model,
+            "messages": [
+                {"role": "system", "content": self._OUTCOME_SYSTEM},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": OUTCOME_MAX_TOKENS,
+            "response_format": OUTCOME_RESPONSE_FORMAT  # Constrain output to the outcome schema
+        }
+
+        response = None
+        if self._outcome_batch is not None:
+            try:
+                response = await self._outcome_batch.submit(request)
+            except Exception as e:
+                logger.warning("Outcome batch unavailable (%r), calling the API directly", e)
+        if response is None:
+            # Use async API call with JSON response format
+            response = await self._call_openai(**request)
+        
+        # Get the outcome from the response
+        content = _completion_content(response).strip()
+
+        parsed = await _validate_json(OutcomeResponse, content)
+        if not parsed.outcome:
+            raise ValueError("Outcome is empty in JSON")
+
+        return parsed.outcome, parsed.resource_changes.model_dump()
+
     async def generate_secret_incentive(self, scenario_title: str, scenario_description: str, options: str) -> dict:
         """
         Generate a secret incentive text that thematically aligns with the scenario.
@@ -384,119 +1200,86 @@ class ScenarioGenerator:
         and explicitly instruct the selected player that if they vote for the chosen option, they will receive the bonus.
         """
         try:
-            # Build the AI prompt. We do not select the option or bonus weight in our code now.
-            prompt = f"""
-            You are a narrative AI generating a secret incentive for a player in a futuristic government council scenario.
-
-            The player has been assigned a hidden bonus objective based on the current situation.
-
-            The scenario is:
-            TITLE: {scenario_title}
-            DESCRIPTION: {scenario_description}
-            OPTIONS: {options}
-
-            Your job is to:
-            - Choose which voting option (from "option1", "option2", "option3", "option4") best aligns with a plausible hidden agenda (note the array of options given are in order so just write option1 or option2, etc)
-            - Write an engaging and perhaps emotional and personalised **1–2 sentence narrative** message to the selected player
-            - Justify the narrative's bonus by tying it to the scenario world
-            - Add a **bonus voting weight** (float from -0.5 to +0.5) that reflects how much influence the player gains or loses if they make the right choice
-
-            🛑 Do **not** directly mention the option number in the narrative.
-            🛑 Do **not** write vague or cryptic messages such as "Your ancestors left a message to do this, etc".
-            ✅ The bonus must feel **earned** and **in-universe** — no vague whispers or clichés.
-            ✅ YOU MUST SOMETIMES GIVE A NEGATIVE BONUS WEIGHT AND NOT ALWAYS FOCUS ON POSITIVE WEIGHTS.
-            ✅ The story of the incentive must be either touching and emotional or something very dark or sinister that can be right from a political thriller.
-
-            ---
-
-            Here are examples of excellent incentives:
-
-            ---
-            "incentive": "You discovered that a rich oil tycoon in your hometown who supports your council position would be assassinated if the plant aliens were to rule the city. Selecting an option that supports the integration of these aliens will thus change your influence by -0.5",
-            "target_option": "option3",
-            "bonus_weight": -0.5
-            ---
-            "incentive": "Your child’s genetic condition is curable — but only with the biotech serum offered by the off-world emissaries. If you advocate for their integration, they’ll not only save him, but hardwire your name into their diplomatic chain — permanently amplifying your council weight by +0.4.",
-            "target_option": "option2",
-            "bonus_weight": +0.4
-            ---
-            "incentive": "The clone of your deceased partner has achieved emotional stability and is petitioning for legal marriage rights. Supporting their recognition will trigger legacy-based voting amplification — your influence will increase by +0.3 due to a family-line exception clause.",
-            "target_option": "option3",
-            "bonus_weight": +0.3
-            ---
-
-            Now write a new one in the **same format**: a JSON object with exactly these keys:
-            - "incentive": short narrative string (1–2 sentences)
-            - "target_option": the internal option name (e.g. "option2")
-            - "bonus_weight": a float from -0.5 to +0.5
-            """
-
-
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a helpful assistant that returns a JSON object with exactly the keys "
-                            "'incentive', 'target_option', and 'bonus_weight'. Do not include any additional text."
-                        )
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                response_format={"type": "json_object"}
+            incentive = await self._cached(
+                _cache_key("incentive", scenario_title, scenario_description, options),
+                lambda: self._request_secret_incentive(scenario_title, scenario_description, options)
             )
+            return dict(incentive)
+        except Exception as e:
+            self._log_api_error("Generating secret incentive", e)
+            # Fallback incentive if something goes wrong.
+            return dict(_FALLBACK_INCENTIVE)
+
+    async def _request_secret_incentive(self, scenario_title: str, scenario_description: str, options: Any) -> Dict[str, Any]:
+        # Build the AI prompt. We do not select the option or bonus weight in our code now.
+        prompt = self._INCENTIVE_TMPL.format_map({
+            "scenario_title": scenario_title,
+            "scenario_description": scenario_description,
+            "options": options
+        })
 
-            content = response.choices[0].message.content
-            logger.info(f"Raw AI incentive response: {content}")
 
-            # Parse the AI response into a JSON object.
-            data = json.loads(content)
-            incentive_text = data.get("incentive", "").strip()
-            target_opt = data.get("target_option", "").strip()
-            weight_str = data.get("bonus_weight", "0")
+        response = await self._call_openai(
+            model=self.incentive_model,
+            messages=[
+                {"role": "system", "content": self._INCENTIVE_SYSTEM},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=INCENTIVE_MAX_TOKENS,
+            response_format=INCENTIVE_RESPONSE_FORMAT
+        )
 
-            if not incentive_text or not target_opt or weight_str is None:
-                raise ValueError("Missing incentive, target_option, or bonus_weight from AI output.")
+        content = _completion_content(response)
+        logger.info("Raw AI incentive response: %s", content)
 
-            bonus_w = float(weight_str)
+        parsed = IncentiveResponse.model_validate_json(content)
+        incentive_text = parsed.incentive.strip()
 
-            return {
-                "incentive": incentive_text,
-                "target_option": target_opt,
-                "bonus_weight": bonus_w
-            }
+        if not incentive_text:
+            raise ValueError("Missing incentive from AI output.")
 
-        except Exception as e:
-            logger.error(f"Error generating secret incentive: {str(e)}")
-            # Fallback incentive if something goes wrong.
-            return {
-                "incentive": "Secretly align with shadowy interests. Vote for option1 to gain +0.2 voting weight for the rest of the game.",
-                "target_option": "option1",
-                "bonus_weight": 0.2
-            }
+        return {
+            "incentive": incentive_text,
+            "target_option": parsed.target_option,
+            "bonus_weight": parsed.bonus_weight
+        }
 
-            
     def _create_fallback_outcome(self) -> Tuple[str, Dict[str, int]]:
-        return (
-            "The council's decision led to mixed results. Some resources were improved while others suffered. The situation remains unresolved, and the council must prepare for future challenges.",
-            {
-                "tech": 0,
-                "manpower": 0,
-                "economy": 0,
-                "happiness": 0,
-                "trust": 0
-            }
-        )
+        # Copy the dict: callers store it on the scenario and may modify it
+        return _FALLBACK_OUTCOME_TEXT, dict(_FALLBACK_RESOURCE_CHANGES)
     
+    async def aclose(self):
+        """Stop background tasks and close the pooled HTTP connections; call on application shutdown."""
+        if self._outcome_batch is not None:
+            await self._outcome_batch.aclose()
+        for _, task in self._prefetched.values():
+            task.cancel()
+        self._prefetched.clear()
+        if self._semantic_save_task is not None:
+            # Let the last write of the semantic cache finish
+            await asyncio.gather(self._semantic_save_task, return_exceptions=True)
+        if self._embed_task is not None:
+            self._embed_task.cancel()
+            await asyncio.gather(self._embed_task, return_exceptions=True)
+            self._embed_task = None
+        if self._pool_task is not None:
+            self._pool_task.cancel()
+            await asyncio.gather(self._pool_task, return_exceptions=True)
+            self._pool_task = None
+        await self.client.close()
+        await self._http_client.aclose()
+
     def clear_conversation_history(self, session_id: str):
         """
         Clear the conversation history for a specific session.
         """
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-            logger.info(f"Cleared conversation history for session {session_id}")
+        self._served.pop(session_id, None)
+        if self.conversation_history.pop(session_id, None) is not None:
+            logger.info("Cleared conversation history for session %s", session_id)
 
-# Create a singleton instance
-scenario_generator = ScenarioGenerator()
+# Lazily created singleton instance
+@lru_cache(maxsize=1)
+def get_scenario_generator() -> ScenarioGenerator:
+    """Create the shared generator on first use so importing this module has no side effects."""
+    return ScenarioGenerator()
@@ -1,21 +1,55 @@
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 from enum import Enum
+import asyncio
+import logging
+import os
+import orjson
+from cachetools import TTLCache
 from .supabase_client import (
     create_game,
     get_game,
+    get_game_bundle,
     get_players,
     get_resources,
     get_secret_incentives,
     update_game,
     update_resources,
     update_player,
+    bulk_update_players,
     add_player,
     add_secret_incentive,
-    record_vote
+    record_votes_bulk,
+    invalidate as invalidate_rows
 )
 from datetime import datetime
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Loaded games are reused for a short window. The frontend also writes some rows straight
+# to Supabase, so entries expire rather than living until the next backend write.
+GAME_CACHE_TTL = float(os.getenv("GAME_CACHE_TTL", "2"))  # seconds
+GAME_CACHE_SIZE = 1024
+
+# Timestamp columns of the games table
+DATETIME_FIELDS = ("timer_end_time", "round_start_time", "round_end_time")
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """Parse a Supabase timestamp string, returning None for empty or malformed values."""
+    if isinstance(value, datetime):
+        # Direct Postgres reads already return datetimes
+        return value
+    if not isinstance(value, str) or not value:
+        return None
+    # fromisoformat only accepts a trailing 'Z' from Python 3.11, and the image runs 3.10
+    if value[-1] == "Z":
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
 class ResourceType(str, Enum):
     TECH = "tech"
     MANPOWER = "manpower"
@@ -42,18 +76,19 @@ class Player(BaseModel):
 class GameState(BaseModel):
     session_id: str
     players: Dict[str, Player] = {}
-    resources: Dict[ResourceType, int] = {
-        ResourceType.TECH: 100,
-        ResourceType.MANPOWER: 100,
-        ResourceType.ECONOMY: 100,
-        ResourceType.HAPPINESS: 100,
-        ResourceType.TRUST: 100
+    # Keyed by ResourceType values ("tech", ...); enums are converted once in update_resources
+    resources: Dict[str, int] = {
+        ResourceType.TECH.value: 100,
+        ResourceType.MANPOWER.value: 100,
+        ResourceType.ECONOMY.value: 100,
+        ResourceType.HAPPINESS.value: 100,
+        ResourceType.TRUST.value: 100
     }
     current_round: int = 1
     max_rounds: int = 10
     current_scenario: Optional[Dict[str, Any]] = None
     current_options: List[str] = []
-    voting_results: Dict[str, Dict[str, str]] = {}  # round -> player_id -> vote
+    voting_results: Dict[int, Dict[str, str]] = {}  # round -> player_id -> vote
     is_active: bool = True
     phase: GamePhase = GamePhase.LOBBY
     elimination_target: Optional[str] = None
@@ -62,20 +97,26 @@ class GameState(BaseModel):
     timer_end_time: Optional[datetime] = None
     timer_running: bool = False
     secret_incentives: Dict[str, str] = {}  # player_id -> incentive
+    # Persisted columns as last read from or written to Supabase (see _columns); save()
+    # writes only what differs from it, and everything while it is still None
+    _saved: Optional[Dict[str, Any]] = PrivateAttr(default=None)
 
-    class Config:
-        arbitrary_types_allowed = True
-        json_encoders = {
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={
             ResourceType: lambda v: v.value,
             datetime: lambda v: v.isoformat() if v else None
-        }
-        extra = "ignore"
+        },
+        extra="ignore",
+        validate_assignment=False,
+        frozen=False
+    )
 
     @classmethod
     async def create(cls, session_id: str, host_id: str) -> 'GameState':
         try:
             # Create game in Supabase
-            game_data = create_game(session_id, host_id)
+            game_data = await create_game(session_id, host_id)
             if not game_data:
                 raise ValueError("Failed to create game in Supabase")
             
@@ -84,14 +125,28 @@ class GameState(BaseModel):
             await game_state.save()  # This will handle resource creation
             return game_state
         except Exception as e:
-            print(f"Error in GameState.create: {str(e)}")
+            logger.error("Error in GameState.create: %s", e)
             raise
 
     @classmethod
     async def load(cls, session_id: str) -> Optional['GameState']:
         try:
-            # 1) Load the top-level "games" row
-            game_data = get_game(session_id)
+            # 1) Load the top-level "games" row along with the players, resources and
+            #    secret incentives rows in one RPC; without the function deployed, the
+            #    four reads are independent, so they run concurrently
+            bundle = await get_game_bundle(session_id)
+            if bundle is not None:
+                game_data = bundle.get("game")
+                players_data = bundle.get("players") or []
+                raw_resources = bundle.get("resources")
+                incentives_data = bundle.get("incentives") or []
+            else:
+                game_data, players_data, raw_resources, incentives_data = await asyncio.gather(
+                    get_game(session_id),
+                    get_players(session_id),
+                    get_resources(session_id),
+                    get_secret_incentives(session_id)
+                )
             if not game_data:
                 return None
 
@@ -101,23 +156,9 @@ class GameState(BaseModel):
                 del game_data_copy["resources"]
 
             # Convert datetime strings to datetime objects if they exist
-            if "timer_end_time" in game_data_copy and game_data_copy["timer_end_time"]:
-                try:
-                    game_data_copy["timer_end_time"] = datetime.fromisoformat(game_data_copy["timer_end_time"].replace('Z', '+00:00'))
-                except (ValueError, TypeError):
-                    game_data_copy["timer_end_time"] = None
-
-            if "round_start_time" in game_data_copy and game_data_copy["round_start_time"]:
-                try:
-                    game_data_copy["round_start_time"] = datetime.fromisoformat(game_data_copy["round_start_time"].replace('Z', '+00:00'))
-                except (ValueError, TypeError):
-                    game_data_copy["round_start_time"] = None
-
-            if "round_end_time" in game_data_copy and game_data_copy["round_end_time"]:
-                try:
-                    game_data_copy["round_end_time"] = datetime.fromisoformat(game_data_copy["round_end_time"].replace('Z', '+00:00'))
-                except (ValueError, TypeError):
-                    game_data_copy["round_end_time"] = None
+            for key in DATETIME_FIELDS:
+                if key in game_data_copy:
+                    game_data_copy[key] = _parse_datetime(game_data_copy[key])
 
             # Ensure timer_running is properly set
             if "timer_running" not in game_data_copy:
@@ -129,10 +170,9 @@ class GameState(BaseModel):
                 # Ensure it's a boolean
                 game_data_copy["timer_running"] = bool(game_data_copy["timer_running"])
                 
-            print(f"Timer running from database: {game_data_copy.get('timer_running')}")  # Debug print
+            logger.debug("Timer running from database: %s", game_data_copy.get('timer_running'))
 
-            # 2) Load players from the "players" table
-            players_data = get_players(session_id)
+            # 2) Build players from the "players" table
             players_dict = {}
             for p in players_data:
                 db_id = p["player_id"] if "player_id" in p else p["id"]
@@ -146,31 +186,26 @@ class GameState(BaseModel):
                     has_voted=p.get("has_voted", False),
                 )
 
-            # 3) Load resources from the "resources" table,
+            # 3) Filter resources from the "resources" table,
             #    which might contain "id", "session_id", "created_at", etc.
-            raw_resources = get_resources(session_id)
-            valid_keys = ["tech", "manpower", "economy", "happiness", "trust"]
-            filtered_resources = {}
+            # No resources row found => all 100
+            filtered_resources = dict.fromkeys(RESOURCE_ORDER, 100)
             if raw_resources:
-                for key in valid_keys:
+                for key in RESOURCE_ORDER:
                     # Gracefully handle None or missing
-                    val = raw_resources.get(key, 100)
                     try:
-                        filtered_resources[ResourceType(key)] = int(val)
-                    except:
-                        filtered_resources[ResourceType(key)] = 100
-            else:
-                # No resources row found => all 100
-                for key in valid_keys:
-                    filtered_resources[ResourceType(key)] = 100
+                        filtered_resources[key] = int(raw_resources.get(key, 100))
+                    except (TypeError, ValueError):
+                        pass
 
-            # 4) Load secret incentives
-            incentives_data = get_secret_incentives(session_id)
+            # 4) Index secret incentives by player
             incentives_dict = {row["player_id"]: row["incentive"] for row in incentives_data}
 
             # 5) Now build the GameState. Note that we do NOT pass in
             #    any leftover "resources" from `game_data_copy`.
             #    We manually set `resources=filtered_resources`.
+            #    Rows can come from asyncpg or the RPC's JSON as well as PostgREST,
+            #    so keep validating them into the model's types.
             game_state = cls(
                 session_id=session_id,
                 players=players_dict,
@@ -188,50 +223,88 @@ class GameState(BaseModel):
                 round_start_time=game_data_copy.get("round_start_time"),
                 round_end_time=game_data_copy.get("round_end_time")
             )
+            game_state._saved = game_state._columns()
             return game_state
 
         except Exception as e:
-            print(f"Error in GameState.load: {str(e)}")
+            logger.error("Error in GameState.load: %s", e)
             return None
 
-    async def save(self):
-        try:
-            # Update game state in Supabase
-            game_updates = {
+    def _columns(self) -> Dict[str, Any]:
+        """The persisted parts of the state, in the shape they are compared between saves."""
+        return {
+            "game": {
                 "current_round": self.current_round,
-                "current_scenario": self.current_scenario,
+                # The scenario is compared by its encoding; it is often mutated in place
+                "current_scenario": orjson.dumps(self.current_scenario),
                 "is_active": self.is_active,
                 "phase": self.phase.value,  # Convert enum to string value
                 "timer_end_time": self.timer_end_time.isoformat() if self.timer_end_time else None,
                 "timer_running": self.timer_running
+            },
+            "resources": dict(self.resources),
+            "players": {player_id: player.model_dump() for player_id, player in self.players.items()}
+        }
+
+    async def save(self):
+        # Saves for a session are serialized; one that was waiting while an earlier
+        # save picked up its changes finds nothing left to write and skips the round trip
+        async with game_manager.save_lock(self.session_id):
+            await self._write()
+
+    async def _write(self):
+        try:
+            columns = self._columns()
+            saved = self._saved
+
+            # Only write what changed since the last save, e.g. just the phase after a vote
+            game_updates = {
+                key: value for key, value in columns["game"].items()
+                if saved is None or saved["game"].get(key) != value
             }
-            print(f"Saving game updates: {game_updates}")  # Debug print
-            update_game(self.session_id, game_updates)
-            
-            # Convert resources from ResourceType enum to string keys
-            resources_dict = {resource_type.value: value for resource_type, value in self.resources.items()}
-            print(f"Saving resources: {resources_dict}")  # Debug print
-            update_resources(self.session_id, resources_dict)
-            
-            # Update players
-            for player_id, player in self.players.items():
-                player_updates = player.dict()
-                print(f"Updating player {player_id}: {player_updates}")  # Debug print
-                update_player(self.session_id, player_id, player_updates)
+            if "current_scenario" in game_updates:
+                game_updates["current_scenario"] = self.current_scenario
+            resources = columns["resources"]
+            if saved is not None and saved["resources"] == resources:
+                resources = None
+            player_rows = [
+                row for player_id, row in columns["players"].items()
+                if saved is None or saved["players"].get(player_id) != row
+            ]
+
+            writes = []
+            if game_updates:
+                logger.debug("Saving game updates: %s", game_updates)
+                writes.append(update_game(self.session_id, game_updates))
+            if resources:
+                logger.debug("Saving resources: %s", resources)
+                # Copied because update_resources adds the session_id to the dict it is given
+                writes.append(update_resources(self.session_id, dict(resources)))
+            if player_rows:
+                # All players go out in one upsert instead of one update per player
+                logger.debug("Updating players: %s", player_rows)
+                writes.append(bulk_update_players(self.session_id, player_rows))
+
+            # The writes are independent, so run them concurrently
+            await asyncio.gather(*writes)
+            # Changes made while the writes were in flight still differ from this snapshot
+            self._saved = columns
+            game_manager.remember(self)
         except Exception as e:
-            print(f"Error in save: {str(e)}")  # Debug print
-            print(f"Error type: {type(e)}")  # Debug print
-            print(f"Error details: {e.__dict__}")  # Debug print
+            logger.error("Error in save: %s", e)
             raise
 
     async def add_player(self, player: Player) -> bool:
         # Count only active players
-        active_players = [p for p in self.players.values() if p.is_active]
-        if len(active_players) >= 4:
+        active_count = sum(p.is_active for p in self.players.values())
+        if active_count >= 4:
             return False
         
         self.players[player.id] = player
-        add_player(self.session_id, player.dict())
+        await add_player(self.session_id, player.model_dump())
+        if self._saved is not None:
+            self._saved["players"][player.id] = player.model_dump()
+        game_manager.remember(self)
         return True
 
     async def remove_player(self, player_id: str) -> bool:
@@ -239,42 +312,44 @@ class GameState(BaseModel):
             return False
             
         del self.players[player_id]
-        update_player(self.session_id, player_id, {"is_active": False})
+        await update_player(self.session_id, player_id, {"is_active": False})
+        if self._saved is not None:
+            self._saved["players"].pop(player_id, None)
+        game_manager.remember(self)
         return True
 
     async def record_vote(self, player_id: str, vote: str) -> bool:
-        if player_id not in self.players or self.players[player_id].has_voted:
-            return False
-            
-        # Update player's voting status
-        self.players[player_id].has_voted = True
-        update_player(self.session_id, player_id, {"has_voted": True})
-        
-        # Store vote in voting_results
-        round_key = str(self.current_round)
-        if round_key not in self.voting_results:
-            self.voting_results[round_key] = {}
-        self.voting_results[round_key][player_id] = vote
-        
-        # Record vote in database
-        record_vote(self.session_id, player_id, self.current_round, vote)
-        
-        # Save the updated game state
-        await self.save()
-        
-        # Check if all players have voted
-        all_voted = all(player.has_voted for player in self.players.values())
-        if all_voted:
+        return await self.record_votes({player_id: vote}) == 1
+
+    async def record_votes(self, votes: Dict[str, str]) -> int:
+        """Record a batch of buffered votes with one write per table; returns how many were accepted."""
+        accepted = {
+            player_id: vote for player_id, vote in votes.items()
+            if player_id in self.players and not self.players[player_id].has_voted
+        }
+        if not accepted:
+            return 0
+
+        for player_id in accepted:
+            self.players[player_id].has_voted = True
+        self.voting_results.setdefault(self.current_round, {}).update(accepted)
+
+        if all(player.has_voted for player in self.players.values()):
             self.phase = GamePhase.RESULTS
-            await self.save()
-            
-        return True
+
+        # save() writes the has_voted flags, and the phase once everyone has voted
+        await asyncio.gather(
+            record_votes_bulk(self.session_id, self.current_round, accepted),
+            self.save()
+        )
+        return len(accepted)
 
     async def update_resources(self, resource_changes: Dict[ResourceType, int]) -> bool:
         for resource_type, change in resource_changes.items():
-            current_value = self.resources[resource_type]
-            new_value = max(0, current_value + change)  # Only cap at 0, allow values above 100
-            self.resources[resource_type] = new_value
+            key = ResourceType(resource_type).value
+            new_value = self.resources[key] + change
+            new_value = new_value if new_value > 0 else 0  # Only cap at 0, allow values above 100
+            self.resources[key] = new_value
             
             if new_value <= 0:
                 self.is_active = False
@@ -285,21 +360,13 @@ class GameState(BaseModel):
         return True
 
     async def check_game_end(self) -> bool:
-        # Check if only one player remains
-        active_players = [p for p in self.players.values() if p.is_active]
-        if len(active_players) <= 1:
-            self.is_active = False
-            await self.save()
-            return True
-
-        # Check if max rounds reached
-        if self.current_round >= self.max_rounds:
-            self.is_active = False
-            await self.save()
-            return True
-
-        # Check if any resource depleted
-        if any(value <= 0 for value in self.resources.values()):
+        # Max rounds reached, any resource depleted, or at most one player left;
+        # the scalar checks run first so the player scan only happens when both pass
+        if (
+            self.current_round >= self.max_rounds
+            or min(self.resources.values(), default=1) <= 0
+            or sum(p.is_active for p in self.players.values()) <= 1
+        ):
             self.is_active = False
             await self.save()
             return True
@@ -308,11 +375,56 @@ class GameState(BaseModel):
 
     async def add_secret_incentive(self, player_id: str, incentive: str):
         self.secret_incentives[player_id] = incentive
-        add_secret_incentive(self.session_id, player_id, incentive)
+        await add_secret_incentive(self.session_id, player_id, incentive)
+        game_manager.remember(self)
+
+# Resource columns, in ResourceType order
+RESOURCE_ORDER = tuple(resource_type.value for resource_type in ResourceType)
 
 class GameManager:
     def __init__(self):
         self.games: Dict[str, GameState] = {}
+        # Read-through cache of GameState.load() results, written through by save()
+        self._loaded = TTLCache(maxsize=GAME_CACHE_SIZE, ttl=GAME_CACHE_TTL)
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        # Locks live here rather than on GameState, which is replaced in the cache on each reload
+        self._save_locks: Dict[str, asyncio.Lock] = {}
+
+    def save_lock(self, session_id: str) -> asyncio.Lock:
+        """Return the lock serializing Supabase writes for a session."""
+        return self._save_locks.setdefault(session_id, asyncio.Lock())
+
+    async def get_or_load(self, session_id: str) -> Optional[GameState]:
+        """
+        Return the session's game, loading it from Supabase only on a cache miss.
+        Concurrent misses for a session share one load, and every caller gets the same
+        instance, so interleaved handlers (e.g. two players voting at once) see each
+        other's changes instead of overwriting them when they save.
+        """
+        game = self._loaded.get(session_id)
+        if game is None:
+            lock = self._load_locks.setdefault(session_id, asyncio.Lock())
+            try:
+                async with lock:
+                    game = self._loaded.get(session_id)
+                    if game is None:
+                        game = await GameState.load(session_id)
+                        if game is None:
+                            return None
+                        self._loaded[session_id] = game
+            finally:
+                if not lock.locked():
+                    self._load_locks.pop(session_id, None)
+        return game
+
+    def remember(self, game: GameState):
+        """Keep the state just written to Supabase as the session's cached instance."""
+        self._loaded[game.session_id] = game
+
+    def invalidate(self, session_id: str):
+        """Drop the cached game after a write that bypassed GameState.save()."""
+        self._loaded.pop(session_id, None)
+        invalidate_rows(session_id)
 
     def create_game(self, session_id: str) -> GameState:
         game = GameState(session_id=session_id)
@@ -340,11 +452,11 @@ class GameManager:
         game = self.get_game(session_id)
         if not game:
             return False
-        
+
         for resource_type, change in resource_changes.items():
-            current_value = game.resources[resource_type]
-            new_value = max(0, min(100, current_value + change))
-            game.resources[resource_type] = new_value
+            key = ResourceType(resource_type).value
+            new_value = max(0, min(100, game.resources[key] + change))
+            game.resources[key] = new_value
             
             if new_value <= 0:
                 game.is_active = False
@@ -357,8 +469,8 @@ class GameManager:
             return False
 
         # Check if only one player remains
-        active_players = [p for p in game.players.values() if p.is_active]
-        if len(active_players) <= 1:
+        active_count = sum(p.is_active for p in game.players.values())
+        if active_count <= 1:
             game.is_active = False
             return True
 
@@ -368,7 +480,7 @@ class GameManager:
             return True
 
         # Check if any resource depleted
-        if any(value <= 0 for value in game.resources.values()):
+        if min(game.resources.values(), default=1) <= 0:
             game.is_active = False
             return True
 
@@ -1,10 +1,21 @@
 from supabase.client import create_client
+import httpx
+import asyncio
+import orjson
+import logging
 import os
-from dotenv import load_dotenv
+from cachetools import TTLCache
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
+from urllib.parse import quote
 
-load_dotenv()
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Containers inject env vars directly; set LOAD_DOTENV=false there to skip the .env lookup
+if os.getenv("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
@@ -12,8 +23,113 @@ supabase_key = os.getenv("SUPABASE_KEY")
 if not supabase_url or not supabase_key:
     raise ValueError("Missing Supabase credentials")
 
+# Synchronous client, still used for ad-hoc queries in the API handlers
 supabase = create_client(supabase_url, supabase_key)
 
+# The helpers below talk to PostgREST directly over one pooled async client, so every
+# call reuses a warm HTTP/2 connection and never blocks the event loop
+REST_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100"))
+REST_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "50"))
+
+rest = httpx.AsyncClient(
+    base_url=f"{supabase_url}/rest/v1",
+    headers={"apikey": supabase_key, "Authorization": f"Bearer {supabase_key}"},
+    http2=True,
+    limits=httpx.Limits(max_connections=REST_MAX_CONNECTIONS, max_keepalive_connections=REST_MAX_KEEPALIVE),
+    timeout=httpx.Timeout(10.0)
+)
+
+# Optional direct Postgres access for the hot point reads, through Supavisor in transaction
+# mode, e.g. postgresql://postgres.<ref>:<password>@aws-0-<region>.pooler.supabase.com:6543/postgres
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+PG_POOL_MIN_SIZE = 5
+PG_POOL_MAX_SIZE = int(os.getenv("SUPABASE_DB_POOL_SIZE", "20"))
+_pg_pool = None
+_pg_pool_lock = asyncio.Lock()
+
+# Cleared after the first call if supabase/functions.sql hasn't been applied
+_bundle_available = True
+
+# Game and resources rows only change on phase/round transitions, so point reads are
+# served from memory for a moment and dropped on every write through this module
+ROW_CACHE_TTL = float(os.getenv("SUPABASE_ROW_CACHE_TTL", "2"))
+_game_cache: TTLCache = TTLCache(maxsize=1024, ttl=ROW_CACHE_TTL)
+_resources_cache: TTLCache = TTLCache(maxsize=1024, ttl=ROW_CACHE_TTL)
+
+# PostgREST Prefer headers
+RETURN_ROWS = {"Prefer": "return=representation"}
+RETURN_NONE = {"Prefer": "return=minimal"}
+UPSERT_RETURN_ROWS = {"Prefer": "resolution=merge-duplicates,return=representation"}
+UPSERT_RETURN_NONE = {"Prefer": "resolution=merge-duplicates,return=minimal"}
+INSERT_IGNORE_DUPLICATES = {"Prefer": "resolution=ignore-duplicates,return=minimal"}
+
+def invalidate(session_id: str):
+    """Drop cached rows for a session after a write that bypassed these helpers."""
+    _game_cache.pop(session_id, None)
+    _resources_cache.pop(session_id, None)
+
+async def aclose():
+    """Close the pooled PostgREST and Postgres connections; call on application shutdown."""
+    global _pg_pool
+    if _pg_pool is not None:
+        await _pg_pool.close()
+        _pg_pool = None
+    await rest.aclose()
+
+async def _init_connection(conn):
+    # Decode jsonb columns into dicts like PostgREST does
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog",
+        encoder=lambda value: orjson.dumps(value).decode(), decoder=orjson.loads
+    )
+
+async def _pg():
+    """Return the asyncpg pool, or None when SUPABASE_DB_URL isn't configured."""
+    global _pg_pool
+    if DATABASE_URL is None or _pg_pool is not None:
+        return _pg_pool
+    async with _pg_pool_lock:
+        if _pg_pool is None:
+            import asyncpg
+            _pg_pool = await asyncpg.create_pool(
+                DATABASE_URL,
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                max_queries=50000,
+                max_inactive_connection_lifetime=300,
+                # Transaction-mode pooling can't keep server-side prepared statements
+                statement_cache_size=0,
+                init=_init_connection
+            )
+    return _pg_pool
+
+async def _fetch(query: str, *args) -> List[dict]:
+    async with (await _pg()).acquire() as conn:
+        return [dict(row) for row in await conn.fetch(query, *args)]
+
+async def _select(table: str, columns: str = "*", **filters) -> List[dict]:
+    params = {"select": columns, **{column: f"eq.{value}" for column, value in filters.items()}}
+    response = await rest.get(f"/{table}", params=params)
+    response.raise_for_status()
+    return response.json()
+
+async def _select_session(url: str, session_id: str) -> List[dict]:
+    # url is one of the precomposed *_URL strings ending in "session_id=eq."
+    response = await rest.get(url + quote(session_id, safe=""))
+    response.raise_for_status()
+    return response.json()
+
+async def _insert(table: str, rows, prefer: Dict[str, str] = RETURN_ROWS, on_conflict: Optional[str] = None) -> Optional[List[dict]]:
+    params = {"on_conflict": on_conflict} if on_conflict else None
+    response = await rest.post(f"/{table}", json=rows, params=params, headers=prefer)
+    response.raise_for_status()
+    return response.json() if response.content else None
+
+async def _update(table: str, updates: dict, **filters) -> None:
+    params = {column: f"eq.{value}" for column, value in filters.items()}
+    response = await rest.patch(f"/{table}", json=updates, params=params, headers=RETURN_NONE)
+    response.raise_for_status()
+
 # Table names
 GAMES_TABLE = "games"
 PLAYERS_TABLE = "players"
@@ -21,35 +137,51 @@ VOTES_TABLE = "votes"
 RESOURCES_TABLE = "resources"
 SECRET_INCENTIVES_TABLE = "secret_incentives"
 
-def get_game(session_id: str):
+# Column projections for the reads; the rows also carry ids and timestamps nothing here uses
+GAME_COLUMNS = (
+    "session_id,host_id,current_round,max_rounds,is_active,phase,current_scenario,"
+    "timer_running,timer_end_time,round_start_time,round_end_time"
+)
+PLAYER_COLUMNS = "player_id,name,role,secret_incentive,is_active,vote_weight,has_voted"
+VOTE_COLUMNS = "player_id,vote"
+RESOURCE_COLUMNS = "tech,manpower,economy,happiness,trust"
+SECRET_INCENTIVE_COLUMNS = "player_id,incentive"
+
+# The per-session point reads are composed once here; each call only appends the session id
+GAME_URL = f"/{GAMES_TABLE}?select={GAME_COLUMNS}&session_id=eq."
+PLAYERS_URL = f"/{PLAYERS_TABLE}?select={PLAYER_COLUMNS}&session_id=eq."
+RESOURCES_URL = f"/{RESOURCES_TABLE}?select={RESOURCE_COLUMNS}&session_id=eq."
+SECRET_INCENTIVES_URL = f"/{SECRET_INCENTIVES_TABLE}?select={SECRET_INCENTIVE_COLUMNS}&session_id=eq."
+
+GAME_SQL = f"SELECT {GAME_COLUMNS} FROM {GAMES_TABLE} WHERE session_id = $1"
+PLAYERS_SQL = f"SELECT {PLAYER_COLUMNS} FROM {PLAYERS_TABLE} WHERE session_id = $1"
+RESOURCES_SQL = f"SELECT {RESOURCE_COLUMNS} FROM {RESOURCES_TABLE} WHERE session_id = $1"
+SECRET_INCENTIVES_SQL = f"SELECT {SECRET_INCENTIVE_COLUMNS} FROM {SECRET_INCENTIVES_TABLE} WHERE session_id = $1"
+
+DEFAULT_RESOURCES = {"tech": 100, "manpower": 100, "economy": 100, "happiness": 100, "trust": 100}
+
+async def get_game(session_id: str):
+    cached = _game_cache.get(session_id)
+    if cached is not None:
+        return cached.copy()
     try:
         # Select only game-specific columns from the games table
-        columns = (
-            "session_id, host_id, current_round, max_rounds, is_active, phase, current_scenario, "
-            "timer_running, timer_end_time, round_start_time, round_end_time"
-        )
-        response = (
-            supabase
-            .table(GAMES_TABLE)
-            .select(columns)
-            .eq("session_id", session_id)
-            .single()
-            .execute()
-        )
+        if DATABASE_URL:
+            rows = await _fetch(GAME_SQL, session_id)
+        else:
+            rows = await _select_session(GAME_URL, session_id)
         
-        if not response.data:
-            print(f"No game found for session_id: {session_id}")  # Debug print
+        if not rows:
+            logger.debug("No game found for session_id: %s", session_id)
             return None
             
-        print(f"Game data from Supabase: {response.data}")  # Debug print
-        return response.data
+        _game_cache[session_id] = rows[0]
+        return rows[0].copy()
     except Exception as e:
-        print(f"Error in get_game: {str(e)}")  # Debug print
-        print(f"Error type: {type(e)}")  # Debug print
-        print(f"Error details: {e.__dict__}")  # Debug print
+        logger.error("Error in get_game: %s", e)
         return None
 
-def create_game(session_id: str, host_id: str):
+async def create_game(session_id: str, host_id: str):
     try:
         # Create game in Supabase
         game_data = {
@@ -61,22 +193,17 @@ def create_game(session_id: str, host_id: str):
             "phase": "lobby"
         }
         
-        response = supabase.table(GAMES_TABLE).insert(game_data).execute()
-        
-        if not response.data:
+        # return=representation hands back the stored row, so no separate verification read
+        rows = await _insert(GAMES_TABLE, game_data)
+        if not rows:
             raise ValueError("Failed to create game in Supabase")
             
-        # Verify the game was created
-        verify_response = supabase.table(GAMES_TABLE).select("*").eq("session_id", session_id).execute()
-        if not verify_response.data:
-            raise ValueError("Game creation verification failed")
-            
-        return verify_response.data[0]
+        return rows[0]
     except Exception as e:
-        print(f"Error creating game in Supabase: {str(e)}")
+        logger.error("Error creating game in Supabase: %s", e)
         raise
 
-def update_game(session_id: str, updates: dict):
+async def update_game(session_id: str, updates: dict):
     try:
         # Make sure datetime objects are converted to ISO format strings
         updates_copy = updates.copy()
@@ -84,18 +211,18 @@ def update_game(session_id: str, updates: dict):
             if isinstance(value, datetime):
                 updates_copy[key] = value.isoformat()
         
-        response = supabase.table(GAMES_TABLE).update(updates_copy).eq("session_id", session_id).execute()
-        print(f"Game update response: {response}")  # Debug print
-        return response
+        await _update(GAMES_TABLE, updates_copy, session_id=session_id)
+        _game_cache.pop(session_id, None)
     except Exception as e:
-        print(f"Error updating game: {str(e)}")
+        logger.error("Error updating game: %s", e)
         raise
 
-def get_players(session_id: str):
-    response = supabase.table(PLAYERS_TABLE).select("*").eq("session_id", session_id).execute()
-    return response.data
+async def get_players(session_id: str):
+    if DATABASE_URL:
+        return await _fetch(PLAYERS_SQL, session_id)
+    return await _select_session(PLAYERS_URL, session_id)
 
-def add_player(session_id: str, player_data: dict):
+async def add_player(session_id: str, player_data: dict):
     try:
         # Create a copy of player data to avoid modifying the original
         player_insert_data = player_data.copy()
@@ -111,100 +238,127 @@ def add_player(session_id: str, player_data: dict):
         if "player_id" not in player_insert_data:
             raise ValueError("Player ID is required")
             
-        # Insert player into Supabase
-        response = supabase.table(PLAYERS_TABLE).insert(player_insert_data).execute()
-        
-        if not response.data:
+        # Insert player into Supabase; the inserted row comes back in the response
+        rows = await _insert(PLAYERS_TABLE, player_insert_data)
+        if not rows:
             raise ValueError("Failed to insert player into Supabase")
             
-        # Verify player was added
-        verify_response = supabase.table(PLAYERS_TABLE).select("*").eq("session_id", session_id).eq("player_id", player_insert_data["player_id"]).execute()
-        if not verify_response.data:
-            raise ValueError("Player creation verification failed")
-            
-        return verify_response.data[0]
+        return rows[0]
     except Exception as e:
-        print(f"Error adding player to Supabase: {str(e)}")
+        logger.error("Error adding player to Supabase: %s", e)
         raise
 
-def update_player(session_id: str, player_id: str, updates: dict):
-    supabase.table(PLAYERS_TABLE).update(updates).eq("session_id", session_id).eq("id", player_id).execute()
+async def update_player(session_id: str, player_id: str, updates: dict):
+    await _update(PLAYERS_TABLE, updates, session_id=session_id, player_id=player_id)
 
-def get_votes(session_id: str, round_number: int):
-    return supabase.table(VOTES_TABLE).select("*").eq("session_id", session_id).eq("round", round_number).execute()
+async def bulk_update_players(session_id: str, players: List[dict]):
+    """Write every player row for a session in one upsert round trip."""
+    rows = []
+    for player_data in players:
+        row = player_data.copy()
+        row["session_id"] = session_id
+        if "id" in row:
+            row["player_id"] = row.pop("id")
+        rows.append(row)
+    if not rows:
+        return None
+    return await _insert(PLAYERS_TABLE, rows, prefer=UPSERT_RETURN_NONE, on_conflict="session_id,player_id")
+
+async def get_votes(session_id: str, round_number: int) -> List[dict]:
+    return await _select(VOTES_TABLE, VOTE_COLUMNS, session_id=session_id, round=round_number)
 
-def record_vote(session_id: str, player_id: str, round: int, vote: str):
-    supabase.table(VOTES_TABLE).insert({
+async def record_vote(session_id: str, player_id: str, round: int, vote: str):
+    await _insert(VOTES_TABLE, {
         "session_id": session_id,
         "player_id": player_id,
         "round": round,
         "vote": vote
-    }).execute()
+    }, prefer=RETURN_NONE)
 
-def get_resources(session_id: str) -> Dict[str, int]:
+async def record_votes_bulk(session_id: str, round: int, votes: Dict[str, str]):
+    """Insert a round's buffered votes in one round trip, skipping any already recorded."""
+    rows = [
+        {"session_id": session_id, "player_id": player_id, "round": round, "vote": vote}
+        for player_id, vote in votes.items()
+    ]
+    if not rows:
+        return
+    await _insert(VOTES_TABLE, rows, prefer=INSERT_IGNORE_DUPLICATES, on_conflict="session_id,player_id,round")
+
+async def get_resources(session_id: str) -> Dict[str, int]:
+    cached = _resources_cache.get(session_id)
+    if cached is not None:
+        return dict(cached)
     try:
         # Query the resources table for the specific session
-        result = supabase.table("resources").select("*").eq("session_id", session_id).single().execute()
+        if DATABASE_URL:
+            rows = await _fetch(RESOURCES_SQL, session_id)
+        else:
+            rows = await _select_session(RESOURCES_URL, session_id)
         
-        if result.data:
+        if rows:
             # Extract individual resource values
-            resources = {
-                "tech": result.data.get("tech", 100),
-                "manpower": result.data.get("manpower", 100),
-                "economy": result.data.get("economy", 100),
-                "happiness": result.data.get("happiness", 100),
-                "trust": result.data.get("trust", 100)
-            }
-            return resources
-        else:
-            # If no resources found, return default values
-            return {
-                "tech": 100,
-                "manpower": 100,
-                "economy": 100,
-                "happiness": 100,
-                "trust": 100
-            }
+            resources = {key: rows[0].get(key, default) for key, default in DEFAULT_RESOURCES.items()}
+            _resources_cache[session_id] = resources
+            return dict(resources)
+        # If no resources found, return default values
+        return dict(DEFAULT_RESOURCES)
     except Exception as e:
-        print(f"Error in get_resources: {e.__dict__ if hasattr(e, '__dict__') else str(e)}")
-        print(f"Error type: {type(e)}")
+        logger.error("Error in get_resources: %s", e)
         # Return default values on error
-        return {
-            "tech": 100,
-            "manpower": 100,
-            "economy": 100,
-            "happiness": 100,
-            "trust": 100
-        }
+        return dict(DEFAULT_RESOURCES)
 
-def update_resources(session_id: str, resources: dict):
+async def update_resources(session_id: str, resources: dict):
     try:
         # Add session_id to resources
         resources["session_id"] = session_id
         
         # Use upsert to handle both insert and update cases
-        response = (
-            supabase
-            .table(RESOURCES_TABLE)
-            .upsert(resources, on_conflict="session_id")
-            .execute()
-        )
+        rows = await _insert(RESOURCES_TABLE, resources, prefer=UPSERT_RETURN_ROWS, on_conflict="session_id")
+        _resources_cache.pop(session_id, None)
         
-        if not response.data:
+        if not rows:
             raise ValueError("Failed to update resources in Supabase")
             
-        return response.data[0]
+        return rows[0]
     except Exception as e:
-        print(f"Error updating resources: {str(e)}")
+        logger.error("Error updating resources: %s", e)
         raise
 
-def get_secret_incentives(session_id: str):
-    response = supabase.table(SECRET_INCENTIVES_TABLE).select("*").eq("session_id", session_id).execute()
-    return response.data
+async def get_secret_incentives(session_id: str):
+    if DATABASE_URL:
+        return await _fetch(SECRET_INCENTIVES_SQL, session_id)
+    return await _select_session(SECRET_INCENTIVES_URL, session_id)
+
+async def get_game_bundle(session_id: str) -> Optional[dict]:
+    """
+    Fetch the game row, players, resources and secret incentives in one round trip
+    through the get_game_bundle function from supabase/functions.sql. Returns None
+    when the function isn't deployed so callers can fall back to separate reads.
+    """
+    global _bundle_available
+    if not _bundle_available:
+        return None
+    if DATABASE_URL:
+        try:
+            rows = await _fetch("SELECT get_game_bundle($1) AS bundle", session_id)
+            return rows[0]["bundle"]
+        except Exception as e:
+            # 42883 = undefined_function
+            if getattr(e, "sqlstate", None) != "42883":
+                raise
+    else:
+        response = await rest.post("/rpc/get_game_bundle", json={"sid": session_id})
+        if response.status_code != 404:
+            response.raise_for_status()
+            return response.json()
+    logger.warning("get_game_bundle is not deployed; falling back to separate reads")
+    _bundle_available = False
+    return None
 
-def add_secret_incentive(session_id: str, player_id: str, incentive: str):
-    supabase.table(SECRET_INCENTIVES_TABLE).insert({
+async def add_secret_incentive(session_id: str, player_id: str, incentive: str):
+    await _insert(SECRET_INCENTIVES_TABLE, {
         "session_id": session_id,
         "player_id": player_id,
         "incentive": incentive
-    }).execute() 
\ No newline at end of file
+    }, prefer=RETURN_NONE)
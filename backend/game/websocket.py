@@ -1,15 +1,32 @@
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, List, Optional
-import json
-from game.state import GameState, GamePhase
+from pydantic import BaseModel
+import orjson
+import os
+import redis.asyncio as aioredis
+from game.state import GameState, GamePhase, game_manager
 from datetime import datetime, timedelta
 import asyncio
-from game.supabase_client import supabase
 import logging
-from ai.scenario_generator import scenario_generator
+from ai.scenario_generator import get_scenario_generator
 
 logger = logging.getLogger(__name__)
 
+# With several workers a session's sockets can be spread across processes; when Redis is
+# configured, broadcasts are published once and every worker delivers to its own sockets
+REDIS_URL = os.getenv("REDIS_URL")
+BROADCAST_CHANNEL_PREFIX = "sess:"
+
+def _json_default(obj):
+    # Some payloads carry Player models straight from the game state
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError
+
+def encode_message(message: dict) -> str:
+    """Serialize an outgoing message with orjson; sent as a text frame the clients JSON.parse."""
+    return orjson.dumps(message, default=_json_default).decode()
+
 class GameWebSocketManager:
     def __init__(self):
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
@@ -17,23 +34,24 @@ class GameWebSocketManager:
         self.timer_start_times: Dict[str, datetime] = {}
         self.timer_durations: Dict[str, int] = {}  # in seconds
         self.loading_states: Dict[str, bool] = {}  # Track loading state per session
+        self.pending_votes: Dict[str, Dict[str, str]] = {}  # Buffered until the round's votes are in
+        self._redis = None
+        self._pubsub_task: Optional[asyncio.Task] = None
 
     async def connect(self, websocket: WebSocket, session_id: str, player_id: str):
         await websocket.accept()
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = {}
-        self.active_connections[session_id][player_id] = websocket
+        self.active_connections.setdefault(session_id, {})[player_id] = websocket
         logger.info(f"Player {player_id} connected to session {session_id}")
         
         # Send current loading state to newly connected player
         if session_id in self.loading_states and self.loading_states[session_id]:
-            await websocket.send_json({
+            await websocket.send_text(encode_message({
                 "type": "loading_state",
                 "payload": {
                     "isLoading": True,
                     "message": "Stand By for New Council Motion..."
                 }
-            })
+            }))
         
         await self.check_and_start_timer(session_id)
 
@@ -48,28 +66,78 @@ class GameWebSocketManager:
                 # Clear loading state when all players disconnect
                 if session_id in self.loading_states:
                     del self.loading_states[session_id]
+                await self.flush_votes(session_id)
         logger.info(f"Player {player_id} disconnected from session {session_id}")
 
+    async def start_pubsub(self):
+        """Subscribe to broadcasts from every worker; a no-op unless REDIS_URL is set."""
+        if not REDIS_URL or self._pubsub_task is not None:
+            return
+        self._redis = aioredis.from_url(REDIS_URL)
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(BROADCAST_CHANNEL_PREFIX + "*")
+        self._pubsub_task = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        try:
+            async for item in pubsub.listen():
+                if item["type"] != "pmessage":
+                    continue
+                session_id = item["channel"].decode()[len(BROADCAST_CHANNEL_PREFIX):]
+                try:
+                    await self._deliver(session_id, orjson.loads(item["data"]), item["data"].decode())
+                except Exception as e:
+                    logger.error("Error delivering broadcast for session %s: %s", session_id, e)
+        finally:
+            await pubsub.aclose()
+
+    async def aclose(self):
+        """Stop the broadcast subscriber and close the Redis connection."""
+        if self._pubsub_task is not None:
+            self._pubsub_task.cancel()
+            await asyncio.gather(self._pubsub_task, return_exceptions=True)
+            self._pubsub_task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
     async def broadcast_to_session(self, session_id: str, message: dict):
+        # Encode once; the same text goes to every worker and every socket
+        payload = encode_message(message)
+        if self._redis is not None:
+            try:
+                await self._redis.publish(BROADCAST_CHANNEL_PREFIX + session_id, payload)
+                return
+            except Exception as e:
+                logger.error("Publishing broadcast for session %s failed, delivering locally: %s", session_id, e)
+        await self._deliver(session_id, message, payload)
+
+    async def _deliver(self, session_id: str, message: dict, payload: str):
         if session_id in self.active_connections:
             # Update loading state tracking if this is a loading state message
             if message.get("type") == "loading_state":
                 self.loading_states[session_id] = message["payload"]["isLoading"]
             
-            # Broadcast to all connected clients
-            for connection in self.active_connections[session_id].values():
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting message to session {session_id}: {str(e)}")
-                    # Don't raise the exception - continue trying to send to other clients
+            # Send to all connected clients concurrently
+            connections = list(self.active_connections[session_id].items())
+            results = await asyncio.gather(
+                *(connection.send_text(payload) for _, connection in connections),
+                return_exceptions=True
+            )
+            # Don't raise - drop the sockets that failed and keep the rest
+            for (player_id, connection), result in zip(connections, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error broadcasting message to session {session_id}: {str(result)}")
+                    sockets = self.active_connections.get(session_id)
+                    if sockets is not None and sockets.get(player_id) is connection:
+                        del sockets[player_id]
 
     async def check_and_start_timer(self, session_id: str):
         """Check if all players are connected and start the timer if they are."""
         logger.info(f"Checking if all players are connected for session {session_id}")
         
         # Get the game state
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             logger.error(f"Game not found for session {session_id}")
             return
@@ -144,40 +212,32 @@ class GameWebSocketManager:
             end_time = start_time + timedelta(seconds=duration)
             logger.info(f"Timer will end at {end_time.isoformat()}")
             
-            # Check the timer every second
-            while True:
-                now = datetime.utcnow()
-                remaining = (end_time - now).total_seconds()
-                
-                if remaining <= 0:
-                    logger.info(f"Timer expired for session {session_id} at {now.isoformat()}")
-                    logger.info(f"Total elapsed time: {(now - start_time).total_seconds():.2f} seconds")
-                    
-                    # Transition to results phase
-                    game = await GameState.load(session_id)
-                    if game:
-                        game.phase = GamePhase.RESULTS
-                        await game.save()
-                        logger.info(f"Game phase updated to {game.phase}")
-                        
-                        # Broadcast phase change to all connected clients
-                        await self.broadcast_to_session(session_id, {"type": "phase_change", "phase": "results"})
-                        logger.info(f"Broadcasted phase change to results for session {session_id}")
-                    else:
-                        logger.error(f"Game not found for session {session_id}, cannot transition to results phase")
-                    break
-                
-                # Log the remaining time every 10 seconds
-                if int(remaining) % 10 == 0:
-                    logger.info(f"Timer for session {session_id}: {int(remaining)} seconds remaining")
+            # Sleep once until the timer ends; start_timer and disconnect cancel this task early
+            await asyncio.sleep(max(0.0, (end_time - datetime.utcnow()).total_seconds()))
+            now = datetime.utcnow()
+            logger.info(f"Timer expired for session {session_id} at {now.isoformat()}")
+            logger.info(f"Total elapsed time: {(now - start_time).total_seconds():.2f} seconds")
+            
+            # Transition to results phase
+            game = await game_manager.get_or_load(session_id)
+            if game:
+                await self.flush_votes(session_id, game)
+                game.phase = GamePhase.RESULTS
+                await game.save()
+                logger.info(f"Game phase updated to {game.phase}")
                 
-                # Wait for 1 second before checking again
-                await asyncio.sleep(1)
+                # Broadcast phase change to all connected clients
+                await self.broadcast_to_session(session_id, {"type": "phase_change", "phase": "results"})
+                logger.info(f"Broadcasted phase change to results for session {session_id}")
+            else:
+                logger.error(f"Game not found for session {session_id}, cannot transition to results phase")
                 
+        except asyncio.CancelledError:
+            logger.info(f"Timer for session {session_id} cancelled")
+            raise
         except Exception as e:
             logger.error(f"Error in timer check for session {session_id}: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error details: {e.__dict__}")
+            logger.debug("Error details: %r", e, exc_info=True)
             raise
 
     async def broadcast_timer_update(self, session_id: str, remaining_seconds: int):
@@ -190,9 +250,10 @@ class GameWebSocketManager:
 
     async def end_timer(self, session_id: str):
         logger.info(f"Ending timer for session {session_id}")
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if game:
             logger.info(f"Updating game phase to results for session {session_id}")
+            await self.flush_votes(session_id, game)
             game.phase = GamePhase.RESULTS
             await game.save()
             
@@ -222,7 +283,7 @@ class GameWebSocketManager:
                 player_id = payload.get("player_id")
                 player_name = payload.get("player_name")
                 if player_id and player_name:
-                    game = await GameState.load(session_id)
+                    game = await game_manager.get_or_load(session_id)
                     if not game:
                         game = await GameState.create(session_id)
                     
@@ -248,20 +309,19 @@ class GameWebSocketManager:
 
             elif message_type == "start_game":
                 # Generate initial scenario
-                game = await GameState.load(session_id)
+                game = await game_manager.get_or_load(session_id)
                 if game and len(game.players) >= 2:
-                    # Generate scenario using OpenAI
-                    title, description = await scenario_generator.generate_scenario(game.dict())
-                    options = await scenario_generator.generate_voting_options(title, description)
+                    # Generate scenario and voting options in a single OpenAI call
+                    generated = await get_scenario_generator().generate_scenario_bundle(game.model_dump())
                     
                     # Format scenario
                     scenario = {
-                        "title": title,
-                        "description": description,
+                        "title": generated.title,
+                        "description": generated.description,
                         "consequences": "The council's decision will have significant implications for our future.",
                         "options": [
                             {"id": f"option{i+1}", "text": option} 
-                            for i, option in enumerate(options)
+                            for i, option in enumerate(generated.options)
                         ]
                     }
                     
@@ -287,12 +347,12 @@ class GameWebSocketManager:
                 player_id = payload.get("player_id")
                 vote = payload.get("vote")
                 if player_id and vote:
-                    game = await GameState.load(session_id)
-                    if game:
-                        round_key = str(game.current_round)
-                        if round_key not in game.voting_results:
-                            game.voting_results[round_key] = {}
-                        game.voting_results[round_key][player_id] = vote
+                    # Buffer votes and write the round's votes together once everyone is in
+                    pending = self.pending_votes.setdefault(session_id, {})
+                    pending[player_id] = vote
+                    game = await game_manager.get_or_load(session_id)
+                    if game and all(p.has_voted or p.id in pending for p in game.players.values()):
+                        await self.flush_votes(session_id, game)
 
         except WebSocketDisconnect:
             await self.disconnect(session_id, websocket.client.host)
@@ -303,6 +363,16 @@ class GameWebSocketManager:
             if session_id in self.timer_start_times:
                 del self.timer_start_times[session_id]
 
+    async def flush_votes(self, session_id: str, game: Optional[GameState] = None):
+        """Write any buffered votes for a session in a single batch."""
+        votes = self.pending_votes.pop(session_id, None)
+        if not votes:
+            return
+        if game is None:
+            game = await game_manager.get_or_load(session_id)
+        if game:
+            await game.record_votes(votes)
+
     async def clear_loading_state(self, session_id: str):
         """Clear the loading state for a session."""
         if session_id in self.loading_states:
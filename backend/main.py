@@ -1,18 +1,19 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 import os
 import logging
 import asyncio
-from game.websocket import manager
+from concurrent.futures import ThreadPoolExecutor
+from game.websocket import manager, encode_message
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 import uuid
-from game.state import GameState, Player, GamePhase
-from game.supabase_client import supabase, get_game, get_players, add_player, update_player, get_votes
+from game.state import GameState, Player, GamePhase, game_manager
+from postgrest.types import ReturnMethod
+from game.supabase_client import supabase, get_game, get_players, add_player, update_player, get_votes, aclose as close_supabase
 from datetime import datetime, timedelta
-from ai.scenario_generator import scenario_generator
-import json
+from ai.scenario_generator import get_scenario_generator, WARM_POOL_ENABLED
+import orjson
 import random
 import string
 
@@ -30,7 +31,10 @@ logging.getLogger('httpx').setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
+# Containers inject env vars directly; set LOAD_DOTENV=false there to skip the .env lookup
+if os.getenv("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Log environment variables (without sensitive values)
 logger.info("Environment variables loaded:")
@@ -64,6 +68,9 @@ class VoteRequest(BaseModel):
     player_id: str
     option: str
 
+# Threads available to blocking supabase-py calls
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
 # Store active timer tasks
 timer_tasks: Dict[str, asyncio.Task] = {}
 
@@ -71,14 +78,16 @@ timer_tasks: Dict[str, asyncio.Task] = {}
 secret_incentives: Dict[str, Dict[int, Dict[str, str]]] = {}
 # A lock per session to prevent race conditions.
 secret_incentive_locks: Dict[str, asyncio.Lock] = {}
+# Incentive generation started as soon as a round's scenario is known, keyed like secret_incentives.
+incentive_tasks: Dict[str, Dict[int, asyncio.Future]] = {}
 
 async def check_timer(session_id: str):
     try:
         # logger.info(f"Starting timer check for session {session_id}")
         while True:
             # Get current game state
-            game = await GameState.load(session_id)
-            # logger.info(f"Timer check - Game state: {game.dict() if game else 'None'}")         
+            game = await game_manager.get_or_load(session_id)
+            # logger.info(f"Timer check - Game state: {game.model_dump() if game else 'None'}")         
             if not game:
                 logger.info(f"Game not found for session {session_id}, stopping timer")
                 break
@@ -87,36 +96,44 @@ async def check_timer(session_id: str):
                 logger.info(f"Timer not running for session {session_id}, stopping timer check")
                 break
 
+            if not game.timer_end_time:
+                logger.info(f"Timer has no end time for session {session_id}, stopping timer check")
+                break
+
             # Use timezone-aware datetime for comparison
             now = datetime.utcnow().replace(tzinfo=None)
-            if game.timer_end_time and now >= game.timer_end_time.replace(tzinfo=None):
-                logger.info(f"Timer expired for session {session_id}")
-                # Update game phase to results
-                game.phase = GamePhase.RESULTS
-                game.timer_running = False
-                game.timer_end_time = None
-                
-                # Update in Supabase
-                update_data = {
-                    "phase": "results",
-                    "timer_running": False,
-                    "timer_end_time": None,
-                    "updated_at": now.isoformat()
-                }
-                result = supabase.table("games").update(update_data).eq("session_id", session_id).execute()
-                logger.info(f"Updated game phase to results: {result}")
-                
-                # Save game state
-                await game.save()
-                
-                # Broadcast phase change to all connected clients
-                await manager.broadcast_to_session(session_id, {
-                    "type": "phase_change",
-                    "payload": {"phase": "results"}
-                })
-                break
+            if now < game.timer_end_time.replace(tzinfo=None):
+                # Sleep once until the deadline; update_timer cancels this task when the timer
+                # is stopped or restarted, and the state is re-read in case it moved elsewhere
+                await asyncio.sleep((game.timer_end_time.replace(tzinfo=None) - now).total_seconds())
+                continue
 
-            await asyncio.sleep(1)  # Check every second
+            logger.info(f"Timer expired for session {session_id}")
+            # Update game phase to results
+            game.phase = GamePhase.RESULTS
+            game.timer_running = False
+            game.timer_end_time = None
+            
+            # Update in Supabase
+            update_data = {
+                "phase": "results",
+                "timer_running": False,
+                "timer_end_time": None,
+                "updated_at": now.isoformat()
+            }
+            result = await asyncio.to_thread(supabase.table("games").update(update_data, returning=ReturnMethod.minimal).eq("session_id", session_id).execute)
+            game_manager.invalidate(session_id)
+            logger.info(f"Updated game phase to results: {result}")
+            
+            # Save game state
+            await game.save()
+            
+            # Broadcast phase change to all connected clients
+            await manager.broadcast_to_session(session_id, {
+                "type": "phase_change",
+                "payload": {"phase": "results"}
+            })
+            break
     except Exception as e:
         logger.error(f"Error in timer check for session {session_id}: {str(e)}")
         raise
@@ -136,6 +153,19 @@ outcome_generation_locks: Dict[str, asyncio.Lock] = {}
 # Store secret incentives for each round
 secret_incentives: Dict[str, Dict[int, Dict[str, str]]] = {}
 
+def drop_incentive_prefetches(session_id: str):
+    """Cancel a session's unused incentive prefetches so they stop running (and billing)."""
+    for task in incentive_tasks.pop(session_id, {}).values():
+        task.cancel()
+
+def prefetch_secret_incentive(session_id: str, round_num: int, title: str, description: str, options):
+    """Generate the round's secret incentive in the background while the scenario is saved and broadcast."""
+    # Only the current round's incentive can still be requested
+    drop_incentive_prefetches(session_id)
+    incentive_tasks[session_id] = {round_num: asyncio.create_task(
+        get_scenario_generator().generate_secret_incentive(title, description, options)
+    )}
+
 def generate_session_code():
     """Generate a random 6-digit alphanumeric code."""
     # Use uppercase letters and numbers, excluding similar characters
@@ -151,7 +181,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, player_id: s
     await manager.connect(websocket, session_id, player_id)
     try:
         while True:
-            data = await websocket.receive_json()
+            data = orjson.loads(await websocket.receive_text())
             await manager.handle_message(websocket, session_id, data)
     except WebSocketDisconnect:
         await manager.disconnect(session_id, player_id)
@@ -161,34 +191,46 @@ async def scenario_websocket(websocket: WebSocket, session_id: str):
     await websocket.accept()
     try:
         # Get game state
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             await websocket.close(code=1008, reason="Game not found")
             return
 
-        # Generate scenario title and description with streaming
-        title, description = await scenario_generator.generate_scenario(game.dict())
-        
-        # Send title and description in chunks
-        await websocket.send_json({
-            "type": "scenario_title",
-            "content": title
-        })
-        
-        # Split description into chunks and send
-        chunk_size = 100
-        for i in range(0, len(description), chunk_size):
-            chunk = description[i:i + chunk_size]
-            await websocket.send_json({
-                "type": "scenario_description",
-                "content": chunk
-            })
-            await asyncio.sleep(0.1)  # Small delay between chunks
+        # Stream the title and description to the client as the model generates them;
+        # a failure before the first chunk already yields the fallback scenario
+        sent_title, sent_description = "", ""
+        try:
+            async for title, description in get_scenario_generator().generate_scenario_partials(game.model_dump()):
+                if title != sent_title:
+                    # The client replaces the title on each update
+                    await websocket.send_text(encode_message({
+                        "type": "scenario_title",
+                        "content": title
+                    }))
+                    sent_title = title
+                if len(description) > len(sent_description):
+                    # The client appends description chunks, so send only the new text
+                    await websocket.send_text(encode_message({
+                        "type": "scenario_description",
+                        "content": description[len(sent_description):]
+                    }))
+                    sent_description = description
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            # Part of the scenario is already on screen, so tell the client it won't be completed
+            logger.error("Scenario stream failed for session %s: %s", session_id, e)
+            await websocket.send_text(encode_message({
+                "type": "scenario_error",
+                "message": "Scenario generation failed"
+            }))
+            await websocket.close(code=1011)
+            return
         
         # Send completion message
-        await websocket.send_json({
+        await websocket.send_text(encode_message({
             "type": "scenario_complete"
-        })
+        }))
         
         # Keep connection alive for a short time
         await asyncio.sleep(5)
@@ -197,7 +239,7 @@ async def scenario_websocket(websocket: WebSocket, session_id: str):
         logger.info(f"WebSocket disconnected for session {session_id}")
     except Exception as e:
         logger.error(f"Error in scenario WebSocket: {str(e)}")
-        await websocket.close(code=1011, reason=str(e))
+        await websocket.close(code=1011)
 
 # Game endpoints
 @app.post("/api/games")
@@ -227,7 +269,7 @@ async def create_game(request: CreateGameRequest):
             raise HTTPException(status_code=500, detail="Failed to add host player")
         
         # Verify game was created in Supabase
-        game_data = get_game(session_id)
+        game_data = await get_game(session_id)
         if not game_data:
             logger.error("Game creation verification failed")
             raise HTTPException(status_code=500, detail="Game creation verification failed")
@@ -240,30 +282,29 @@ async def create_game(request: CreateGameRequest):
         }
     except Exception as e:
         logger.error(f"Error creating game: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error details: {e.__dict__}")
+        logger.debug("Error details: %r", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/games/{session_id}/join")
 async def join_game(session_id: str, request: JoinGameRequest):
     logger.debug("=== Starting join game process ===")
-    logger.debug(f"Session ID: {session_id}")
-    logger.debug(f"Player name: {request.player_name}")
+    logger.debug("Session ID: %s", session_id)
+    logger.debug("Player name: %s", request.player_name)
     
     try:
         # First check if game exists in Supabase
         logger.debug("Checking if game exists in Supabase...")
-        game_data = get_game(session_id)
+        game_data = await get_game(session_id)
         if not game_data:
             logger.error(f"Game {session_id} not found in Supabase")
             raise HTTPException(status_code=404, detail="Game not found")
         
-        logger.debug(f"Found game in Supabase: {game_data}")
+        logger.debug("Found game in Supabase: %s", game_data)
         
         # Check current active players
         logger.debug("Checking current players...")
-        players_data = get_players(session_id)
-        logger.debug(f"Current players: {players_data}")
+        players_data = await get_players(session_id)
+        logger.debug("Current players: %s", players_data)
         
         # Count only active players
         active_players = [p for p in players_data if p.get("is_active", True)]
@@ -273,7 +314,7 @@ async def join_game(session_id: str, request: JoinGameRequest):
         
         # Create new player
         player_id = str(uuid.uuid4())
-        logger.debug(f"Creating new player with ID: {player_id}")
+        logger.debug("Creating new player with ID: %s", player_id)
         
         player = Player(
             id=player_id,
@@ -286,8 +327,9 @@ async def join_game(session_id: str, request: JoinGameRequest):
         # Add player to game
         logger.debug("Attempting to add player to game...")
         try:
-            add_player(session_id, player.dict())
-            logger.debug(f"Successfully added player {request.player_name} to game {session_id}")
+            await add_player(session_id, player.model_dump())
+            game_manager.invalidate(session_id)
+            logger.debug("Successfully added player %s to game %s", request.player_name, session_id)
         except Exception as e:
             logger.error(f"Failed to add player to Supabase: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to add player to game")
@@ -303,13 +345,12 @@ async def join_game(session_id: str, request: JoinGameRequest):
         raise he
     except Exception as e:
         logger.error(f"Unexpected error in join_game: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error details: {e.__dict__}")
+        logger.debug("Error details: %r", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/games/{session_id}/vote")
 async def record_vote(session_id: str, request: VoteRequest):
-    game = await GameState.load(session_id)
+    game = await game_manager.get_or_load(session_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
@@ -321,7 +362,7 @@ async def record_vote(session_id: str, request: VoteRequest):
 
 @app.get("/api/games/{session_id}", response_model=GameState)
 async def get_game_state(session_id: str):
-    game_state = await GameState.load(session_id)
+    game_state = await game_manager.get_or_load(session_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="Game not found")
     
@@ -329,8 +370,8 @@ async def get_game_state(session_id: str):
     if game_state.current_scenario:
         if isinstance(game_state.current_scenario, str):
             try:
-                game_state.current_scenario = json.loads(game_state.current_scenario)
-            except json.JSONDecodeError:
+                game_state.current_scenario = orjson.loads(game_state.current_scenario)
+            except orjson.JSONDecodeError:
                 logger.error(f"Failed to parse scenario JSON: {game_state.current_scenario}")
                 game_state.current_scenario = None
         elif not isinstance(game_state.current_scenario, dict):
@@ -355,13 +396,13 @@ async def start_game(session_id: str):
         
         # Load game state
         logger.info("Loading game state...")
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             logger.error(f"Game not found for session_id: {session_id}")
             await manager.clear_loading_state(session_id)  # Clear loading state before raising error
             raise HTTPException(status_code=404, detail="Game not found")
         
-        logger.info(f"Current game state: {game.dict()}")
+        logger.info(f"Current game state: {game.model_dump()}")
         
         if len(game.players) < 2:
             logger.error(f"Not enough players to start game. Current players: {len(game.players)}")
@@ -374,20 +415,16 @@ async def start_game(session_id: str):
             logger.info(f"Incremented round number to: {game.current_round}")
         
         try:
-            # Generate scenario using OpenAI
-            logger.info("Generating scenario using OpenAI...")
-            title, description = await scenario_generator.generate_scenario(game.dict())
-            
-            # Generate voting options
-            logger.info("Generating voting options...")
-            options = await scenario_generator.generate_voting_options(title, description)
+            # Generate scenario and voting options in a single OpenAI call
+            logger.info("Generating scenario and voting options using OpenAI...")
+            scenario = await get_scenario_generator().generate_scenario_bundle(game.model_dump())
             
             # Format scenario
             generated_scenario = {
-                "title": title,
-                "description": description,
+                "title": scenario.title,
+                "description": scenario.description,
                 "consequences": "The council's decision will have far-reaching consequences for our society.",
-                "options": [{"id": f"option{i+1}", "text": option} for i, option in enumerate(options)]
+                "options": [{"id": f"option{i+1}", "text": option} for i, option in enumerate(scenario.options)]
             }
         except Exception as e:
             logger.error(f"Error generating scenario: {str(e)}")
@@ -395,13 +432,14 @@ async def start_game(session_id: str):
             raise HTTPException(status_code=500, detail="Failed to generate scenario")
         
         logger.info(f"Generated scenario: {generated_scenario}")
+        prefetch_secret_incentive(session_id, game.current_round, scenario.title, scenario.description, generated_scenario["options"])
         game.current_scenario = generated_scenario
         game.phase = GamePhase.SCENARIO
         
         # Update game in Supabase
         logger.info("Updating game in Supabase...")
         update_data = {
-            "current_scenario": json.dumps(generated_scenario),  # Convert to JSON string
+            "current_scenario": orjson.dumps(generated_scenario).decode(),  # Convert to JSON string
             "phase": "scenario",
             "current_round": game.current_round,  # Add round number to update
             "updated_at": datetime.utcnow().isoformat()
@@ -409,7 +447,8 @@ async def start_game(session_id: str):
         logger.info(f"Update data: {update_data}")
         
         try:
-            result = supabase.table("games").update(update_data).eq("session_id", session_id).execute()
+            result = await asyncio.to_thread(supabase.table("games").update(update_data, returning=ReturnMethod.minimal).eq("session_id", session_id).execute)
+            game_manager.invalidate(session_id)
             logger.info(f"Supabase response: {result}")
             
             if hasattr(result, 'error') and result.error:
@@ -452,15 +491,14 @@ async def start_game(session_id: str):
         # Ensure loading state is cleared even on error
         await manager.clear_loading_state(session_id)
         logger.error(f"Unexpected error in start_game: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error details: {e.__dict__}")
+        logger.debug("Error details: %r", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.patch("/api/games/{session_id}/timer")
 async def update_timer(session_id: str, request: Request):
     try:
         updates = await request.json()
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
             
@@ -472,11 +510,12 @@ async def update_timer(session_id: str, request: Request):
             end_time = None
             
         # Update timer state in Supabase
-        result = supabase.table("games").update({
+        result = await asyncio.to_thread(supabase.table("games").update({
             "timer_end_time": end_time.isoformat() if end_time else None,
             "timer_running": updates.get("timer_running", False),
             "updated_at": datetime.utcnow().replace(tzinfo=None).isoformat()
-        }).eq("session_id", session_id).execute()
+        }).eq("session_id", session_id).execute)
+        game_manager.invalidate(session_id)
         
         # Check if the update was successful
         if not result.data:
@@ -488,10 +527,12 @@ async def update_timer(session_id: str, request: Request):
         game.timer_running = updates.get("timer_running", False)
         await game.save()
         
-        # If starting the timer, ensure the timer check task is running
+        # The timer check sleeps until the end time, so replace it whenever the timer changes
+        task = timer_tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            task.cancel()
         if game.timer_running:
-            if session_id not in timer_tasks or timer_tasks[session_id].done():
-                timer_tasks[session_id] = asyncio.create_task(check_timer(session_id))
+            timer_tasks[session_id] = asyncio.create_task(check_timer(session_id))
         
         return {"message": "Timer updated successfully"}
     except Exception as e:
@@ -499,20 +540,21 @@ async def update_timer(session_id: str, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.patch("/api/games/{session_id}/players/{player_id}")
-async def update_player(session_id: str, player_id: str, request: Request):
+async def update_player_state(session_id: str, player_id: str, request: Request):
     try:
         updates = await request.json()
-        logger.debug(f"Updating player {player_id} in session {session_id} with updates: {updates}")
+        logger.debug("Updating player %s in session %s with updates: %s", player_id, session_id, updates)
         
         # Update player in Supabase
-        update_player(session_id, player_id, updates)
+        await update_player(session_id, player_id, updates)
+        game_manager.invalidate(session_id)
         
         # Get updated game state
-        game_state = await GameState.load(session_id)
+        game_state = await game_manager.get_or_load(session_id)
         if not game_state:
             raise HTTPException(status_code=404, detail="Game not found")
             
-        return game_state.dict()
+        return game_state.model_dump()
     except Exception as e:
         logger.error(f"Error updating player: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -527,18 +569,16 @@ async def update_game_phase(session_id: str, request: Request):
             raise HTTPException(status_code=400, detail="Phase is required")
             
         # Update game phase in Supabase
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
             
         # Update phase in Supabase
-        from game.supabase_client import supabase
-        from datetime import datetime
-        
-        result = supabase.table("games").update({
+        result = await asyncio.to_thread(supabase.table("games").update({
             "phase": new_phase,
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("session_id", session_id).execute()
+        }, returning=ReturnMethod.minimal).eq("session_id", session_id).execute)
+        game_manager.invalidate(session_id)
         
         if result.error:
             logger.error(f"Error updating game phase in Supabase: {result.error}")
@@ -565,7 +605,7 @@ async def update_game_phase(session_id: str, request: Request):
 async def get_voting_options(session_id: str):
     try:
         # Get game state
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
             
@@ -574,11 +614,18 @@ async def get_voting_options(session_id: str):
         if not current_scenario:
             raise HTTPException(status_code=400, detail="No scenario available")
             
-        # Generate voting options
-        options = await scenario_generator.generate_voting_options(
+        # Generate voting options together with the round's secret incentive
+        options, incentive = await get_scenario_generator().generate_options_and_incentive(
             current_scenario.get("title", ""),
             current_scenario.get("description", "")
         )
+        # The incentive targets these options, so replace any prefetched for the old ones
+        stale = incentive_tasks.setdefault(session_id, {}).pop(game.current_round, None)
+        if stale is not None:
+            stale.cancel()
+        ready = asyncio.get_running_loop().create_future()
+        ready.set_result(incentive)
+        incentive_tasks[session_id][game.current_round] = ready
         
         # Update the game state with the options
         current_scenario["options"] = options
@@ -596,7 +643,8 @@ async def update_player_weight(session_id: str, player_id: str, new_weight: floa
     Adjust to your real DB logic.
     """
     try:
-        result = supabase.table("players").update({"vote_weight": new_weight}).eq("player_id", player_id).eq("session_id", session_id).execute()
+        result = await asyncio.to_thread(supabase.table("players").update({"vote_weight": new_weight}).eq("player_id", player_id).eq("session_id", session_id).execute)
+        game_manager.invalidate(session_id)
         if not result.data:
             logger.error("Failed to update player's vote_weight in database")
             raise Exception("Failed to update player's vote_weight in database")
@@ -620,7 +668,7 @@ async def get_voting_outcome(session_id: str):
         })
 
         # Get game state
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             logger.error(f"Game not found for session {session_id}")
             # Clear loading state before raising error
@@ -676,7 +724,7 @@ async def get_voting_outcome(session_id: str):
             logger.info(f"Acquired outcome generation lock for session {session_id}")
 
             # --- Reload game state *inside* the lock to get the latest data ---
-            game = await GameState.load(session_id)
+            game = await game_manager.get_or_load(session_id)
             if not game or not game.current_scenario:
                  logger.error(f"Game or scenario disappeared while holding lock for session {session_id}")
                  # Clear loading state before raising error
@@ -709,18 +757,18 @@ async def get_voting_outcome(session_id: str):
                 
             logger.info(f"Proceeding with outcome generation for session {session_id}")
             # Get the voting results for the current round
-            round_key = str(game.current_round)
+            round_key = game.current_round
             voting_results = game.voting_results.get(round_key, {})
             
             logger.info(f"Voting results for round {round_key}: {voting_results}")
             
             if not voting_results:
                 # Try to get votes from the database
-                votes = get_votes(session_id, game.current_round)
-                if votes.data:
+                votes = await get_votes(session_id, game.current_round)
+                if votes:
                     # Convert database votes to voting_results format
                     # Ensure vote is always a string to prevent unhashable dict errors
-                    voting_results = {vote["player_id"]: str(vote["vote"]) for vote in votes.data}
+                    voting_results = {vote["player_id"]: str(vote["vote"]) for vote in votes}
                     # Update game state with the votes
                     game.voting_results[round_key] = voting_results
                     # No need to save here, will be saved after outcome generation
@@ -738,8 +786,6 @@ async def get_voting_outcome(session_id: str):
                 
             # Count votes for each option
             vote_counts = {}
-            round_key = str(game.current_round)
-            voting_results = game.voting_results[round_key]
 
             # Retrieve the secret incentive for this round
             incentive = secret_incentives.get(session_id, {}).get(game.current_round)
@@ -766,7 +812,8 @@ async def get_voting_outcome(session_id: str):
             winning_option = max(vote_counts.items(), key=lambda x: x[1])[0]
             
             # Generate outcome
-            outcome, resource_changes = await scenario_generator.generate_voting_outcome(
+            outcome, resource_changes = await get_scenario_generator().generate_voting_outcome(
+                session_id,
                 current_scenario.get("title", ""),
                 current_scenario.get("description", ""),
                 current_scenario.get("options", []),
@@ -785,6 +832,15 @@ async def get_voting_outcome(session_id: str):
             logger.info(f"Saving generated outcome and resource changes for session {session_id}")
             await game.save() # Save the game state with the new outcome and resource changes
             logger.info(f"Outcome and resource changes saved for session {session_id}. Releasing lock.")
+
+            # Voting for this round is over, so an incentive nobody requested is no longer needed
+            drop_incentive_prefetches(session_id)
+
+            # Players read the outcome before the host advances; generate the next round's scenario meanwhile
+            next_state = game.model_dump()
+            next_state["current_round"] = game.current_round + 1
+            next_state["current_scenario"] = None  # next_round clears the scenario before generating
+            get_scenario_generator().prefetch_next_scenario(next_state)
             
             # Clear loading state after successful outcome generation
             await manager.broadcast_to_session(session_id, {
@@ -815,7 +871,7 @@ async def get_voting_outcome(session_id: str):
 async def get_vote_count(session_id: str, round: int, option: str):
     try:
         # Directly query the votes table
-        result = supabase.table("votes").select("*").eq("session_id", session_id).eq("round", round).eq("vote", option).execute()
+        result = await asyncio.to_thread(supabase.table("votes").select("player_id").eq("session_id", session_id).eq("round", round).eq("vote", option).execute)
         
         if not hasattr(result, 'data'):
             logger.error("Invalid response from database")
@@ -846,7 +902,7 @@ async def next_round(session_id: str):
         })
 
         # Get current game state
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
 
@@ -856,15 +912,16 @@ async def next_round(session_id: str):
         game.current_scenario = None  # Clear previous scenario and outcome
         await game.save()
 
-        # Generate new scenario
-        title, description = await scenario_generator.generate_scenario(game.dict())
-        options = await scenario_generator.generate_voting_options(title, description)
+        # Generate new scenario together with its voting options
+        scenario = await get_scenario_generator().generate_scenario_bundle(game.model_dump())
+
+        prefetch_secret_incentive(session_id, game.current_round, scenario.title, scenario.description, scenario.options)
 
         # Update game with new scenario
         game.current_scenario = {
-            "title": title,
-            "description": description,
-            "options": options,
+            "title": scenario.title,
+            "description": scenario.description,
+            "options": list(scenario.options),
             "outcome": None  # Ensure outcome is cleared
         }
         await game.save()
@@ -906,7 +963,7 @@ async def generate_secret_incentive(session_id: str, round: int):
     """
     try:
         # Load the game state.
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
         
@@ -936,18 +993,22 @@ async def generate_secret_incentive(session_id: str, round: int):
             scenario_description = current_scenario.get("description", "")
             scenario_options = current_scenario.get("options", "")
             
-            # Use your scenario generator to generate incentive text.
-            incentive_response = await scenario_generator.generate_secret_incentive(
-                scenario_title,
-                scenario_description,
-                scenario_options
-            )
+            # Use the incentive prefetched when the scenario was generated, if any.
+            incentive_task = incentive_tasks.get(session_id, {}).pop(round, None)
+            if incentive_task is not None:
+                incentive_response = await incentive_task
+            else:
+                incentive_response = await get_scenario_generator().generate_secret_incentive(
+                    scenario_title,
+                    scenario_description,
+                    scenario_options
+                )
             
             new_incentive = {
                 "player_id": selected_player_id,
                 "text": incentive_response["incentive"],
                 "target_option": incentive_response["target_option"],
-                "bonus_weight": float(incentive_response["bonus_weight"])
+                "bonus_weight": incentive_response["bonus_weight"]
             }
             
             # Store the incentive.
@@ -967,7 +1028,7 @@ async def get_secret_incentive(session_id: str, player_id: str, round: int):
     """
     try:
         # Load the game state to ensure the session exists.
-        game = await GameState.load(session_id)
+        game = await game_manager.get_or_load(session_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
         
@@ -993,17 +1054,34 @@ async def clear_incentives(session_id: str):
     try:
         if session_id in secret_incentives:
             del secret_incentives[session_id]
+        drop_incentive_prefetches(session_id)
         return {"message": "Incentives cleared successfully"}
     except Exception as e:
         logger.error(f"Error clearing incentives: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Clean up timer tasks when the server shuts down
+@app.on_event("startup")
+async def startup_event():
+    # Blocking supabase-py calls run via asyncio.to_thread; cap how many threads they can use
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS))
+    await manager.start_pubsub()
+    if WARM_POOL_ENABLED:
+        get_scenario_generator().start_warm_pool()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     for task in timer_tasks.values():
         task.cancel()
     await asyncio.gather(*timer_tasks.values(), return_exceptions=True)
+    for session_id in list(incentive_tasks):
+        drop_incentive_prefetches(session_id)
+    await manager.aclose()
+    if get_scenario_generator.cache_info().currsize:
+        await get_scenario_generator().aclose()
+        # Its HTTP pool is closed now; a later startup in this process must build a new one
+        get_scenario_generator.cache_clear()
+    await close_supabase()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1017,4 +1095,4 @@ if __name__ == "__main__":
     # print(f"- Local: ${import.meta.env.VITE_BACKEND_URL}")
     print(f"- Network: http://{local_ip}:8000")
     print(f"- All interfaces: http://0.0.0.0:8000\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws="websockets", ws_per_message_deflate=True) 
\ No newline at end of file
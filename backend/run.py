@@ -6,5 +6,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        ws="websockets",
+        ws_per_message_deflate=True,
         log_level="info"
     ) 
\ No newline at end of file
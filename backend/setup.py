@@ -8,7 +8,7 @@ setup(
         "fastapi==0.109.2",
         "uvicorn==0.27.1",
         "python-dotenv==1.0.1",
-        "openai==1.12.0",
+        "openai==1.40.0",
         "websockets==12.0",
         "redis==5.0.1",
         "sqlalchemy==2.0.27",
@@ -17,6 +17,13 @@ setup(
         "python-jose[cryptography]==3.3.0",
         "passlib[bcrypt]==1.7.4",
         "python-multipart==0.0.9",
+        "cachetools==5.3.2",
+        "numpy==1.26.4",
+        "h2==4.1.0",
+        "orjson==3.9.15",
+        "tenacity==8.2.3",
+        "aiolimiter==1.1.0",
+        "asyncpg==0.29.0",
     ],
     python_requires=">=3.10",
 ) 
\ No newline at end of file
@@ -0,0 +1,61 @@
+import os
+import sys
+
+# The backend modules build their clients at import time, so point them at dummy
+# credentials before any test imports them
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LOAD_DOTENV"] = "false"
+for name in ("REDIS_URL", "SUPABASE_DB_URL", "SEMANTIC_CACHE_PATH"):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game.state as state
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Record the Supabase writes made through game.state instead of sending them."""
+    calls = []
+
+    def fake(name):
+        async def write(*args, **kwargs):
+            calls.append((name, args))
+        return write
+
+    for name in ("update_game", "update_resources", "bulk_update_players", "record_votes_bulk",
+                 "add_player", "update_player", "add_secret_incentive"):
+        monkeypatch.setattr(state, name, fake(name))
+    return calls
+
+@pytest.fixture(autouse=True)
+def game_manager():
+    """The shared GameManager, emptied so no game or lock outlives its test."""
+    manager = state.game_manager
+    # main and game.websocket import this instance by name, so reset it instead of replacing it
+    manager.__init__()
+    yield manager
+    manager.__init__()
+
+@pytest.fixture
+def cached_game(game_manager):
+    """Factory putting a game in the cache as if it had just been loaded from Supabase."""
+    def make(**fields) -> state.GameState:
+        game = state.GameState(**fields)
+        game._saved = game._columns()
+        game_manager.remember(game)
+        return game
+    return make
+
+@pytest.fixture
+def make_players():
+    """Factory for a players dict keyed by the given ids."""
+    def make(*player_ids) -> dict:
+        return {
+            player_id: state.Player(id=player_id, name=player_id, role="Council Member", secret_incentive="N/A")
+            for player_id in player_ids
+        }
+    return make
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+import ai.batch_queue as batch_queue
+from ai.batch_queue import BatchOutcomeQueue
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}]
+}
+
+class FakeBatchClient:
+    """Just enough of openai.AsyncOpenAI's files and batches APIs for BatchOutcomeQueue."""
+
+    def __init__(self, status="in_progress"):
+        self.status = status
+        self.uploads = []
+        self.cancelled = []
+        self.files = SimpleNamespace(create=self._upload, content=self._content)
+        self.batches = SimpleNamespace(create=self._create, retrieve=self._retrieve, cancel=self._cancel)
+
+    async def _upload(self, file, purpose):
+        self.uploads.append([orjson.loads(line) for line in file[1].split(b"\n")])
+        return SimpleNamespace(id="file-in")
+
+    async def _create(self, **kwargs):
+        return SimpleNamespace(id="batch-1")
+
+    async def _retrieve(self, batch_id):
+        return SimpleNamespace(status=self.status, output_file_id="file-out")
+
+    async def _cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+    async def _content(self, file_id):
+        lines = [
+            orjson.dumps({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": COMPLETION}})
+            for request in self.uploads[-1]
+        ]
+        return SimpleNamespace(text=b"\n".join(lines).decode())
+
+@pytest.fixture(autouse=True)
+def fast_batches(monkeypatch):
+    monkeypatch.setattr(batch_queue, "BATCH_WINDOW", 0.01)
+    monkeypatch.setattr(batch_queue, "BATCH_POLL_INTERVAL", 0.01)
+
+def test_completed_batch_resolves_every_caller():
+    client = FakeBatchClient(status="completed")
+    queue = BatchOutcomeQueue(client, sla=1.0)
+
+    async def run():
+        return await asyncio.gather(queue.submit({"n": 1}), queue.submit({"n": 2}))
+
+    results = asyncio.run(run())
+
+    assert [result.choices[0].message.content for result in results] == ["ok", "ok"]
+    assert len(client.uploads) == 1
+    assert [request["body"] for request in client.uploads[0]] == [{"n": 1}, {"n": 2}]
+
+def test_timeout_before_flush_drops_the_request():
+    client = FakeBatchClient()
+    queue = BatchOutcomeQueue(client, sla=0.001)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await queue.submit({"n": 1})
+        await queue._flush_task
+
+    asyncio.run(run())
+
+    assert client.uploads == []
+
+def test_timeout_after_flush_cancels_the_batch():
+    client = FakeBatchClient()
+    queue = BatchOutcomeQueue(client, sla=0.03)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await queue.submit({"n": 1})
+        await asyncio.gather(*queue._poll_tasks)
+
+    asyncio.run(run())
+
+    assert len(client.uploads) == 1
+    assert client.cancelled == ["batch-1"]
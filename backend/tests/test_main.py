@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import main
+
+def test_new_incentive_prefetch_cancels_the_previous_round(monkeypatch):
+    class SlowGenerator:
+        async def generate_secret_incentive(self, title, description, options):
+            await asyncio.sleep(60)
+
+    monkeypatch.setattr(main, "get_scenario_generator", SlowGenerator)
+    monkeypatch.setattr(main, "incentive_tasks", {})
+
+    async def run():
+        main.prefetch_secret_incentive("s1", 1, "Flood", "...", [])
+        first = main.incentive_tasks["s1"][1]
+        main.prefetch_secret_incentive("s1", 2, "Fire", "...", [])
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        assert list(main.incentive_tasks["s1"]) == [2]
+        main.drop_incentive_prefetches("s1")
+
+    asyncio.run(run())
+    assert "s1" not in main.incentive_tasks
+
+def test_scenario_socket_reports_a_failed_stream(cached_game, monkeypatch):
+    class BrokenGenerator:
+        async def generate_scenario_partials(self, game_state):
+            yield "Flood", ""
+            raise RuntimeError("secret internal detail")
+
+    monkeypatch.setattr(main, "get_scenario_generator", BrokenGenerator)
+    cached_game(session_id="s1")
+
+    with TestClient(main.app).websocket_connect("/ws/s1/scenario") as websocket:
+        assert websocket.receive_json() == {"type": "scenario_title", "content": "Flood"}
+        assert websocket.receive_json() == {"type": "scenario_error", "message": "Scenario generation failed"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+
+    assert closed.value.code == 1011
+    assert "secret" not in (closed.value.reason or "")
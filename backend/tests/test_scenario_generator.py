@@ -0,0 +1,264 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+import ai.scenario_generator as scenario_generator
+from ai.scenario_generator import EMBEDDING_DIM, Scenario, ScenarioGenerator
+
+def game_state(session_id="s1", round_num=2, outcome="The levee held.", **resources):
+    return {
+        "session_id": session_id,
+        "current_round": round_num,
+        "resources": {"tech": 80, "manpower": 70, "economy": 60, "happiness": 50, "trust": 40, **resources},
+        "players": {"p1": {}, "p2": {}, "p3": {}},
+        "current_scenario": {"title": "Flood", "outcome": outcome}
+    }
+
+def cache_key(state):
+    """The exact-match cache key of a state asked for by a fresh generator."""
+    return ScenarioGenerator()._prepare_scenario_messages(state)[2]
+
+def test_cache_key_is_stable_for_the_same_state():
+    assert cache_key(game_state()) == cache_key(game_state())
+
+@pytest.mark.parametrize("other", [
+    game_state(session_id="s2"),
+    game_state(round_num=3),
+    game_state(outcome="The levee broke."),
+    game_state(trust=41),
+])
+def test_cache_key_separates_states(other):
+    assert cache_key(other) != cache_key(game_state())
+
+def test_cache_key_includes_the_story_so_far():
+    generator = ScenarioGenerator()
+    first = generator._prepare_scenario_messages(game_state())[2]
+    # Same state again, but the session now has an earlier scenario in its history
+    generator.conversation_history["s1"].append({"role": "assistant", "content": "Scenario: Flood"})
+    assert generator._prepare_scenario_messages(game_state())[2] != first
+
+def outcome_generator(monkeypatch):
+    """A generator whose outcome requests are counted instead of sent."""
+    generator = ScenarioGenerator()
+    requests = []
+
+    async def request(title, description, options, winning_option, vote_counts):
+        requests.append(options)
+        return "The levee held.", {"tech": 0, "manpower": 0, "economy": 0, "happiness": 0, "trust": 0}
+
+    monkeypatch.setattr(generator, "_request_voting_outcome", request)
+    return generator, requests
+
+def test_outcome_cache_key_includes_the_options(monkeypatch):
+    generator, requests = outcome_generator(monkeypatch)
+
+    def outcome(options):
+        return generator.generate_voting_outcome("s1", "Flood", "...", options, "option1", {"option1": 2})
+
+    asyncio.run(outcome(["Build a levee", "b", "c", "d"]))
+    asyncio.run(outcome(["Build a levee", "b", "c", "d"]))
+    # Options regenerated for the same scenario need a new outcome
+    asyncio.run(outcome(["Evacuate", "b", "c", "d"]))
+
+    assert len(requests) == 2
+
+def test_outcome_cache_key_includes_the_model(monkeypatch):
+    generator, requests = outcome_generator(monkeypatch)
+
+    asyncio.run(generator.generate_voting_outcome("s1", "Flood", "...", ["a"], "option1", {"option1": 2}))
+    generator.outcome_model = "gpt-4o-mini"
+    asyncio.run(generator.generate_voting_outcome("s1", "Flood", "...", ["a"], "option1", {"option1": 2}))
+
+    assert len(requests) == 2
+
+def semantic_generator(monkeypatch):
+    """A generator whose prompts all embed to the same vector and whose requests are counted."""
+    monkeypatch.setattr(scenario_generator, "SEMANTIC_CACHE_ENABLED", True)
+    generator = ScenarioGenerator()
+    requests = []
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    vector[0] = 1.0
+
+    async def embed(prompt):
+        return vector
+
+    async def request(messages):
+        requests.append(messages)
+        return Scenario(title=f"Crisis {len(requests)}", description="...", options=("a", "b", "c", "d"))
+
+    monkeypatch.setattr(generator, "_embed", embed)
+    monkeypatch.setattr(generator, "_request_scenario", request)
+    return generator, requests
+
+def test_semantic_cache_is_off_by_default(monkeypatch):
+    generator = ScenarioGenerator()
+    requests = []
+
+    async def request(messages):
+        requests.append(messages)
+        return Scenario(title=f"Crisis {len(requests)}", description="...", options=("a", "b", "c", "d"))
+
+    monkeypatch.setattr(generator, "_request_scenario", request)
+
+    async def openings():
+        return await asyncio.gather(*(
+            generator.generate_scenario_bundle(game_state(session_id=f"s{n}", round_num=1, outcome=None))
+            for n in range(3)
+        ))
+
+    titles = [scenario.title for scenario in asyncio.run(openings())]
+    assert len(set(titles)) == 3
+
+def test_semantic_cache_needs_the_same_story(monkeypatch):
+    generator, requests = semantic_generator(monkeypatch)
+
+    asyncio.run(generator._semantic_scenario("s1", "story-a", "prompt", []))
+    # Same prompt embedding, but written for another session's history
+    asyncio.run(generator._semantic_scenario("s2", "story-b", "prompt", []))
+
+    assert len(requests) == 2
+
+def test_semantic_cache_skips_scenarios_the_session_has_seen(monkeypatch):
+    generator, requests = semantic_generator(monkeypatch)
+
+    first = asyncio.run(generator._semantic_scenario("s1", "story", "prompt", []))
+    assert asyncio.run(generator._semantic_scenario("s2", "story", "prompt", [])) is first
+    generator._served["s1"] = {first.title}
+    again = asyncio.run(generator._semantic_scenario("s1", "story", "prompt", []))
+
+    assert again.title != first.title
+    assert len(requests) == 2
+
+def test_semantic_cache_story_key_follows_the_outcome():
+    def story_key(state):
+        return ScenarioGenerator()._prepare_scenario_messages(state)[3]
+
+    assert story_key(game_state()) == story_key(game_state(trust=10))
+    assert story_key(game_state()) != story_key(game_state(outcome="The levee broke."))
+
+def test_semantic_cache_is_saved_in_the_background(monkeypatch, tmp_path):
+    monkeypatch.setattr(scenario_generator, "SEMANTIC_CACHE_PATH", str(tmp_path / "scenarios"))
+    generator, _ = semantic_generator(monkeypatch)
+
+    async def miss():
+        await generator._semantic_scenario("s1", "story", "prompt", [])
+        await generator._semantic_save_task
+
+    asyncio.run(miss())
+    reloaded = ScenarioGenerator()
+
+    assert reloaded._cached_stories == ["story"]
+    assert [scenario.title for scenario in reloaded._cached_scenarios] == ["Crisis 1"]
+
+def completion(content=None, refusal=None, finish_reason="stop"):
+    message = SimpleNamespace(content=content, refusal=refusal)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+@pytest.mark.parametrize("response", [
+    completion(refusal="I can't help with that."),
+    completion(content=None),
+    completion(content='{"title": "Fl', finish_reason="length"),
+])
+def test_completion_content_rejects_unusable_output(response):
+    with pytest.raises(ValueError):
+        scenario_generator._completion_content(response)
+
+def test_refusal_escalates_to_the_quality_model(monkeypatch):
+    generator = ScenarioGenerator()
+    models = []
+    scenario = '{"title": "Flood", "description": "' + "Rising water threatens the city. " * 3 + '", "options": ["a", "b", "c", "d"]}'
+
+    async def call(**request):
+        models.append(request["model"])
+        if len(models) == 1:
+            return completion(refusal="I can't help with that.")
+        return completion(content=scenario)
+
+    monkeypatch.setattr(generator, "_call_openai", call)
+    result = asyncio.run(generator._call_with_escalation([], Scenario, scenario_generator.SCENARIO_RESPONSE_FORMAT))
+
+    assert result.title == "Flood"
+    assert models == [scenario_generator.FAST_MODEL, scenario_generator.QUALITY_MODEL]
+
+def test_request_scenario_normalizes_options_without_mutation(monkeypatch):
+    generator = ScenarioGenerator()
+    parsed = Scenario(title="Flood", description="...", options=("a", "b"))
+
+    async def call(messages, model, response_format):
+        return parsed
+
+    monkeypatch.setattr(generator, "_call_with_escalation", call)
+    scenario = asyncio.run(generator._request_scenario([]))
+
+    assert scenario.options == ("a", "b", "Option 3", "Option 4")
+    assert parsed.options == ("a", "b")
+
+def test_fallback_scenario_is_immutable():
+    with pytest.raises(ValidationError):
+        scenario_generator._FALLBACK_SCENARIO.options = ("x",)
+
+@pytest.mark.parametrize("buffer, expected", [
+    ('{"tit', None),
+    ('{"title": ', None),
+    ('{"title": "', ""),
+    ('{"title": "Flood in', "Flood in"),
+    ('{"title": "Flood", "description": "', "Flood"),
+    ('{"title" : "Say \\"no\\"', 'Say "no"'),
+    ('{"title": "Line\\nbreak', "Line\nbreak"),
+    ('{"title": "Caf\\u00e9', "Café"),
+    # Escape sequences that are still arriving are left out until complete
+    ('{"title": "Tab\\', "Tab"),
+    ('{"title": "Caf\\u00', "Caf"),
+])
+def test_partial_json_string(buffer, expected):
+    assert scenario_generator._partial_json_string(buffer, "title") == expected
+
+def test_scenario_partials_yield_as_fields_grow(monkeypatch):
+    generator = ScenarioGenerator()
+    deltas = ['{"title": "Fl', 'ood", ', '"descr', 'iption": "Water', ' rises"', ', "options": ["a"]}']
+
+    async def stream(game_state):
+        for delta in deltas:
+            yield delta
+
+    monkeypatch.setattr(generator, "generate_scenario_stream", stream)
+
+    async def collect():
+        return [partial async for partial in generator.generate_scenario_partials(game_state())]
+
+    assert asyncio.run(collect()) == [
+        ("Fl", ""),
+        ("Flood", ""),
+        ("Flood", "Water"),
+        ("Flood", "Water rises"),
+    ]
+
+def failing_stream(deltas):
+    async def stream(game_state):
+        for delta in deltas:
+            yield delta
+        raise ValueError("Model output was truncated at the max_tokens limit")
+    return stream
+
+def test_scenario_partials_fall_back_before_any_output(monkeypatch):
+    generator = ScenarioGenerator()
+    monkeypatch.setattr(generator, "generate_scenario_stream", failing_stream(['{"ti']))
+
+    async def collect():
+        return [partial async for partial in generator.generate_scenario_partials(game_state())]
+
+    fallback = scenario_generator._FALLBACK_SCENARIO
+    assert asyncio.run(collect()) == [(fallback.title, fallback.description)]
+
+def test_scenario_partials_raise_after_output(monkeypatch):
+    generator = ScenarioGenerator()
+    monkeypatch.setattr(generator, "generate_scenario_stream", failing_stream(['{"title": "Flo']))
+
+    async def collect():
+        return [partial async for partial in generator.generate_scenario_partials(game_state())]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
@@ -5,7 +5,7 @@ async def verify_game_data(session_id: str):
     print(f"\nVerifying game data for session {session_id}")
     
     # Get game data
-    game_data = get_game(session_id)
+    game_data = await get_game(session_id)
     print("\nGame Data:")
     print(f"Current Round: {game_data['current_round']}")
     print(f"Is Active: {game_data['is_active']}")
@@ -13,7 +13,7 @@ async def verify_game_data(session_id: str):
     print(f"Current Scenario: {game_data['current_scenario']}")
     
     # Get players
-    players_data = get_players(session_id)
+    players_data = await get_players(session_id)
     print("\nPlayers:")
     for player in players_data:
         print(f"- {player['name']} (ID: {player['player_id']})")
@@ -23,20 +23,20 @@ async def verify_game_data(session_id: str):
         print(f"  Has Voted: {player['has_voted']}")
     
     # Get resources
-    resources_data = get_resources(session_id)
+    resources_data = await get_resources(session_id)
     print("\nResources:")
     for resource, value in resources_data.items():
         if resource not in ['id', 'session_id', 'created_at', 'updated_at']:
             print(f"- {resource}: {value}")
     
     # Get votes
-    votes_data = get_votes(session_id, game_data['current_round'])
+    votes_data = await get_votes(session_id, game_data['current_round'])
     print(f"\nVotes for Round {game_data['current_round']}:")
     for vote in votes_data:
         print(f"- Player {vote['player_id']}: {vote['vote']}")
     
     # Get secret incentives
-    incentives_data = get_secret_incentives(session_id)
+    incentives_data = await get_secret_incentives(session_id)
     print("\nSecret Incentives:")
     for incentive in incentives_data:
         print(f"- Player {incentive['player_id']}: {incentive['incentive']}")
@@ -920,6 +920,9 @@ export const MultiplayerProvider: React.FC<{ children: React.ReactNode }> = ({
               // Request voting options
               requestVotingOptions();
               break;
+            case "scenario_error":
+              toast.error(data.message);
+              break;
           }
         };
 
@@ -0,0 +1,44 @@
+-- Fetch everything GameState.load needs in one round trip: the game row with its
+-- players, resources and secret incentives. Each child table is aggregated in its own
+-- subquery so joining players against incentives can't multiply rows.
+CREATE OR REPLACE FUNCTION get_game_bundle(sid TEXT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'game', (
+            SELECT to_jsonb(g)
+            FROM (
+                SELECT session_id, host_id, current_round, max_rounds, is_active, phase,
+                       current_scenario, timer_running, timer_end_time,
+                       round_start_time, round_end_time
+                FROM games
+                WHERE session_id = sid
+            ) g
+        ),
+        'players', COALESCE(
+            (SELECT jsonb_agg(jsonb_build_object(
+                        'player_id', p.player_id, 'name', p.name, 'role', p.role,
+                        'secret_incentive', p.secret_incentive, 'is_active', p.is_active,
+                        'vote_weight', p.vote_weight, 'has_voted', p.has_voted
+                    ) ORDER BY p.created_at)
+             FROM players p WHERE p.session_id = sid),
+            '[]'::jsonb
+        ),
+        'resources', (
+            SELECT jsonb_build_object(
+                'tech', r.tech, 'manpower', r.manpower, 'economy', r.economy,
+                'happiness', r.happiness, 'trust', r.trust
+            )
+            FROM resources r WHERE r.session_id = sid
+        ),
+        'incentives', COALESCE(
+            (SELECT jsonb_agg(jsonb_build_object('player_id', si.player_id, 'incentive', si.incentive))
+             FROM secret_incentives si WHERE si.session_id = sid),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+GRANT EXECUTE ON FUNCTION get_game_bundle(TEXT) TO anon, authenticated;